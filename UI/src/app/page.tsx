@@ -54,7 +54,8 @@ export default function Home() {
     setRecommendation(null);
   }, []);
 
-  // Fetch recommendations
+  // Fetch recommendations as a server-sent event stream: the products arrive
+  // first and the AI text is appended chunk by chunk while it is generated
   const fetchRecommendations = useCallback(async (userId: string) => {
     // Cache control
     if (cache.current.has(userId)) {
@@ -70,21 +71,59 @@ export default function Home() {
       const timeoutId = setTimeout(() => controller.abort(), 10000); // 5s -> 10s yaptık
 
       const response = await fetch(
-        `http://localhost:8000/recommendations/${userId}`,
+        `http://localhost:8000/recommendations/${userId}/stream`,
         { signal: controller.signal }
       );
 
-      clearTimeout(timeoutId);
-
-      if (!response.ok) {
+      if (!response.ok || !response.body) {
+        clearTimeout(timeoutId);
         throw new Error(`Error: ${response.status}`);
       }
 
-      const data = await response.json();
-
-      // Add to cache
-      cache.current.set(userId, data);
-      setRecommendation(data);
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      let current: Recommendation | null = null;
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Events are separated by a blank line
+        const events = buffer.split("\n\n");
+        buffer = events.pop() ?? "";
+
+        for (const raw of events) {
+          const event = raw.match(/^event: (.*)$/m)?.[1];
+          const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] ?? "{}");
+
+          if (event === "context") {
+            // Products are ready: stop the spinner and the timeout
+            clearTimeout(timeoutId);
+            current = { ...data, recommendations: "" };
+            setRecommendation(current);
+            setLoading(false);
+          } else if (event === "chunk" && current) {
+            current = {
+              ...current,
+              recommendations: current.recommendations + data.text,
+            };
+            setRecommendation(current);
+          } else if (event === "done" && current) {
+            current = {
+              ...current,
+              degraded: data.degraded,
+              vector_search: data.vector_search,
+            };
+            setRecommendation(current);
+            // Add to cache
+            cache.current.set(userId, current);
+          } else if (event === "error") {
+            throw new Error(data.detail);
+          }
+        }
+      }
     } catch (err) {
       if (err instanceof Error && err.name === "AbortError") {
         setError("Request timed out. Please try again.");
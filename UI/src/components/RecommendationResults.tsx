@@ -124,6 +124,14 @@ export default function RecommendationResults({ recommendation }: Recommendation
           </div>
         )}
         
+        {/* Text is still streaming in */}
+        {!recommendation.recommendations && !recommendation.degraded && (
+          <div className="animate-pulse space-y-3">
+            <div className="h-4 bg-slate-200/70 rounded w-3/4" />
+            <div className="h-4 bg-slate-200/70 rounded w-1/2" />
+          </div>
+        )}
+        
         <div className="space-y-4">
           {recommendation.recommendations.split('\n').filter(Boolean).map((line, index) => {
             if (line.includes('TOP RECOMMENDATIONS')) {
@@ -21,7 +21,10 @@ export interface UserProfile {
   };
   behavior_summary: {
     total_purchases: number;
+    total_interactions?: number;
+    action_counts?: Record<string, number>;
     favorite_categories: Record<string, number>;
+    category_actions?: Record<string, Record<string, number>>;
   };
   feedback_stats?: FeedbackStats;
 }
@@ -29,6 +32,9 @@ export interface UserProfile {
 export interface Recommendation {
   user_profile: UserProfile;
   recommendations: string;
+  degraded?: boolean;
+  // false while the backend serves SQL-only results during startup
+  vector_search?: boolean;
   similar_products: {
     ids: string[];
     documents: string[];
@@ -1,15 +1,15 @@
 from app.agents.base_agent import BaseAgent
 from app.services.gemini_service import GeminiService
-from typing import Dict, List, Any
-import asyncio
+from app.services.deadline import Deadline, deadline_at
+from typing import Dict, List, Any, Optional
 
 class AIAgent(BaseAgent):
     """Agent providing AI text generation and reasoning capabilities using Gemini"""
     
-    def __init__(self):
+    def __init__(self, service: Optional[GeminiService] = None):
         super().__init__()
         # Wrap the original GeminiService
-        self.service = GeminiService()
+        self.service = service or GeminiService()
     
     @property
     def agent_name(self):
@@ -36,18 +36,14 @@ class AIAgent(BaseAgent):
             "recommendations": result
         }
     
-    async def generate_content(self, prompt: str) -> Dict[str, Any]:
+    async def generate_content(self, prompt: str, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
         """Generate text content based on prompt using Gemini model"""
         # Create custom prompt with agent context
         enhanced_prompt = f"As an {self.agent_name}, {self.agent_role}\n\n{prompt}"
         
         try:
-            # Call Gemini model directly (similar to how the service does it)
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None, 
-                lambda: self.service.model.generate_content(enhanced_prompt)
-            )
+            # Call Gemini through the service so identical prompts hit the response cache
+            content = await self.service.generate_content(enhanced_prompt, deadline_at(deadline))
         
             # Log the activity
             self.log_activity("Generated content", {
@@ -57,7 +53,7 @@ class AIAgent(BaseAgent):
             # Return with agent metadata
             return {
                 "agent": self.agent_name,
-                "content": response.text
+                "content": content
             }
             
         except Exception as e:
@@ -2,6 +2,7 @@ from abc import ABC, abstractmethod
 import os
 import logging
 from typing import Dict, Any
+from app.services.telemetry import add_event
 
 class BaseAgent(ABC):
     """Simple wrapper to convert existing services into agents"""
@@ -27,4 +28,6 @@ class BaseAgent(ABC):
     
     def log_activity(self, activity_type: str, details: Dict[str, Any]) -> None:
         """Log agent activity with structured data"""
-        self.logger.info(f"{self.agent_name}: {activity_type}", extra={"details": details})
\ No newline at end of file
+        self.logger.info(f"{self.agent_name}: {activity_type}", extra={"details": details})
+        # Also visible on the trace of the request, when tracing is enabled
+        add_event(f"{self.agent_name}: {activity_type}", details)
\ No newline at end of file
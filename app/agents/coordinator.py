@@ -1,36 +1,79 @@
 from sqlalchemy.orm import Session
-from app.agents.ai_agent import AIAgent
-from app.agents.feedback_agent import FeedbackAnalyzerAgent
-from app.agents.vector_agent import VectorAgent
-from app.agents.recommendation_agent import RecommendationAgent
-from typing import Dict, List, Any, Optional
-import asyncio
+from app.agents.registry import AgentRegistry, get_agent_registry
+from app.agents.task_graph import TaskGraph
+from app.services.request_context import RequestContext
+from app.services.deadline import Deadline
+from app.services.telemetry import span
+from app.config import get_settings
+from typing import AsyncIterator, Dict, List, Any, Optional, Set, Tuple
 
 class AgentCoordinator:
     """Coordinates multiple agents to create a cohesive multi-agent system"""
     
-    def __init__(self, db: Session):
-        # Initialize all agents
-        self.ai_agent = AIAgent()
-        self.feedback_agent = FeedbackAnalyzerAgent(db)
-        self.vector_agent = VectorAgent()
-        self.recommendation_agent = RecommendationAgent(db)
+    def __init__(self, db: Session, registry: Optional[AgentRegistry] = None):
+        # Shared agents come from the registry; only the DB-bound ones are per request
+        registry = registry or get_agent_registry()
+        self.ai_agent = registry.ai_agent
+        self.feedback_agent = registry.feedback_agent(db)
+        self.vector_agent = registry.vector_agent
+        self.recommendation_agent = registry.recommendation_agent(db)
     
     async def get_smart_recommendations(
         self, 
         user_id: str, 
         query: Optional[str] = None, 
-        limit: int = 5
+        limit: int = 5,
+        deadline: Optional[Deadline] = None
     ) -> Dict[str, Any]:
         """Get enhanced recommendations using multiple agents"""
+        settings = get_settings()
+        # Embeddings, ANN hits, profile and feedback stats are computed once
+        # and shared by every agent working on this request
+        context = RequestContext(deadline)
+        step_timeout = settings.AGENT_STEP_TIMEOUT_SECONDS
+        # Enrichment is dropped first when the deadline gets close
+        min_budget = settings.DEADLINE_MIN_VECTOR_MS / 1000
         
-        # Step 1: Get basic recommendations using recommendation agent
-        recommendation_result = await self.recommendation_agent.get_recommendations(
-            user_id=user_id,
-            query=query,
-            limit=limit
+        graph = self._graph("smart_recommendations", deadline)
+        # Step 1: Get basic recommendations using recommendation agent. It
+        # degrades on its own at the deadline (no LLM text), so it gets a grace
+        # period to return that result; past it we fall back to its products.
+        graph.add(
+            "recommendations",
+            lambda: self.recommendation_agent.get_recommendations(
+                user_id=user_id,
+                query=query,
+                limit=limit,
+                context=context
+            ),
+            optional=True,
+            grace=settings.DEADLINE_GRACE_MS / 1000
         )
         
+        # Step 2: If user provided a specific query, enhance with vector search.
+        # Runs alongside step 1; the shared context lets whichever starts first
+        # do the embedding and ANN query for both.
+        if query:
+            graph.add(
+                "vector_search",
+                lambda: self.vector_agent.search_similar_products(query=query, n_results=limit, context=context),
+                timeout=step_timeout,
+                optional=True,
+                min_budget=min_budget
+            )
+            graph.add(
+                "user_feedback",
+                lambda: self.feedback_agent.get_user_feedback_stats(user_id, context=context),
+                timeout=step_timeout,
+                optional=True,
+                min_budget=min_budget
+            )
+        
+        results = await self._run_graph(graph, deadline)
+        recommendation_result = results["recommendations"]
+        if recommendation_result is None:
+            recommendation_result = await self._fallback_recommendations(user_id, query, limit, context)
+        
         # Handle possible error in recommendation agent
         if "error" in recommendation_result:
             return {
@@ -39,39 +82,13 @@ class AgentCoordinator:
                 "recommendations": []
             }
         
-        # Step 2: If user provided a specific query, enhance with vector search
+        # Merging is cheap and in-process, so it runs after the graph, outside the budget
+        merged = None
         if query:
-            vector_result = await self.vector_agent.search_similar_products(
-                query=query,
-                n_results=limit
-            )
-            
-            # If vector search was successful
-            if "results" in vector_result and not "error" in vector_result:
-                # Get recommended products from recommendation agent
-                recommended_products = recommendation_result.get("products", {}).get("ids", [])
-                
-                # Get vector search products
-                vector_products = [item.get("id") for item in vector_result.get("results", [])]
-                
-                # Combine results (priority to recommendation agent results)
-                combined_products = []
-                product_ids_seen = set()
-                
-                # First add recommendation agent results
-                for product_id in recommended_products:
-                    if product_id not in product_ids_seen:
-                        product_ids_seen.add(product_id)
-                        combined_products.append(product_id)
-                
-                # Then add vector agent results not already included
-                for product_id in vector_products:
-                    if product_id not in product_ids_seen:
-                        product_ids_seen.add(product_id)
-                        combined_products.append(product_id)
-                
-                # Limit to requested number
-                combined_products = combined_products[:limit]
+            with span("smart_recommendations.merge"):
+                merged = await self._merge_results(
+                    recommendation_result, results["vector_search"], results["user_feedback"], limit, context
+                )
         
         # Step 3: Return the enhanced results
         return {
@@ -79,18 +96,163 @@ class AgentCoordinator:
             "user_id": user_id,
             "query": query if query else None,
             "recommendations_text": recommendation_result.get("recommendations_text", ""),
-            "products": recommendation_result.get("products", {}),
+            "products": merged or recommendation_result.get("products", {}),
+            "degraded": recommendation_result.get("degraded", False),
             "agents_used": [
                 self.recommendation_agent.agent_name,
                 self.vector_agent.agent_name if query else None
-            ]
+            ],
+            "request_context": context.stats(),
+            "timings": graph.timings,
+            "deadline": deadline.stats() if deadline else None
+        }
+    
+    async def _fallback_recommendations(
+        self,
+        user_id: str,
+        query: Optional[str],
+        limit: int,
+        context: RequestContext
+    ) -> Dict[str, Any]:
+        """Products without text when the recommendation step ran out of time"""
+        prepared = context.peek(("prepared", user_id, query))
+        if prepared is not None:
+            products = prepared["similar_products"]
+        else:
+            # Not even the candidates were ready: a keyword/category match in SQL
+            profile = context.peek(("profile", user_id))
+            favorite_categories = profile["behavior_summary"]["favorite_categories"] if profile else {}
+            category = next(iter(favorite_categories), "Electronics")
+            products = await self.recommendation_agent.service._sql_candidates_async(
+                None if query else category, query, n_results=limit
+            )
+        return {
+            "agent": self.recommendation_agent.agent_name,
+            "user_id": user_id,
+            "recommendations_text": "",
+            "products": {key: values[:limit] if values is not None else None for key, values in products.items()},
+            "degraded": True
+        }
+    
+    def _graph(self, name: str, deadline: Optional[Deadline]) -> TaskGraph:
+        return TaskGraph(name, budget=deadline.remaining() if deadline else None)
+    
+    async def _run_graph(self, graph: TaskGraph, deadline: Optional[Deadline]) -> Dict[str, Any]:
+        """Run the graph, counting skipped and timed out nodes as deadline misses"""
+        try:
+            return await graph.run()
+        finally:
+            if deadline is not None:
+                for node, timing in graph.timings.items():
+                    if timing["status"] in ("skipped", "timeout"):
+                        deadline.miss(f"{graph.name}.{node}")
+    
+    async def _merge_results(
+        self,
+        recommendation_result: Dict[str, Any],
+        vector_result: Optional[Dict[str, Any]],
+        feedback_result: Optional[Dict[str, Any]],
+        limit: int,
+        context: RequestContext
+    ) -> Optional[Dict[str, List]]:
+        """Merged products, or None when there is nothing to merge with"""
+        if "error" in recommendation_result:
+            return None
+        # Skipped, timed out or failed enrichment leaves the recommendations as they are
+        if not vector_result or "error" in vector_result:
+            return None
+        if not feedback_result or "error" in feedback_result:
+            return None
+        low_rated = feedback_result["feedback_stats"].get("low_rated_products", set())
+        return await self._merge_products(
+            recommendation_result.get("products", {}), vector_result["results"], low_rated, limit, context
+        )
+    
+    async def _merge_products(
+        self,
+        products: Dict[str, List],
+        vector_results: List[Dict[str, Any]],
+        low_rated: Set[str],
+        limit: int,
+        context: RequestContext
+    ) -> Dict[str, List]:
+        """Union of both candidate lists without low-rated products, ranked by distance, cut to limit"""
+        ids = products.get("ids") or []
+        distances = products.get("distances") or []
+        candidates = {}
+        for i, product_id in enumerate(ids):
+            candidates[product_id] = {
+                "id": product_id,
+                "document": products["documents"][i],
+                "metadata": products["metadatas"][i],
+                "distance": distances[i] if len(distances) == len(ids) else None
+            }
+        for item in vector_results:
+            # The recommendation agent's copy already carries feedback stats
+            if item["id"] not in candidates:
+                candidates[item["id"]] = item
+        
+        ranked = [item for item in candidates.values() if item["id"] not in low_rated]
+        # Closest first; products without a distance keep their order after the scored ones
+        ranked.sort(key=lambda item: (item["distance"] is None, item["distance"] or 0.0))
+        ranked = ranked[:limit]
+        
+        missing = [item for item in ranked if "feedback_stats" not in item["metadata"]]
+        if missing:
+            feedback_result = await self.feedback_agent.get_products_feedback_stats(
+                [item["id"] for item in missing], context=context
+            )
+            feedback_stats = feedback_result.get("feedback_stats", {})
+            for item in missing:
+                if item["id"] in feedback_stats:
+                    item["metadata"]["feedback_stats"] = feedback_stats[item["id"]]
+        
+        return {
+            "ids": [item["id"] for item in ranked],
+            "documents": [item["document"] for item in ranked],
+            "metadatas": [item["metadata"] for item in ranked],
+            # Only meaningful when every product has one
+            "distances": (
+                [item["distance"] for item in ranked]
+                if all(item["distance"] is not None for item in ranked) else []
+            )
         }
     
-    async def analyze_product_feedback(self, product_id: str) -> Dict[str, Any]:
+    async def stream_smart_recommendations(
+        self, 
+        user_id: str, 
+        query: Optional[str] = None, 
+        limit: int = 5,
+        deadline: Optional[Deadline] = None
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Stream recommendations: the product list first, then the text as it is generated"""
+        context = RequestContext(deadline)
+        async for event, data in self.recommendation_agent.stream_recommendations(user_id, query, limit, context):
+            if event == "done":
+                data = {**data, "agents_used": [self.recommendation_agent.agent_name]}
+            yield event, data
+    
+    async def analyze_product_feedback(self, product_id: str, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
         """Analyze product feedback using multiple agents"""
+        settings = get_settings()
+        graph = self._graph("product_insights", deadline)
         
         # Step 1: Get product feedback statistics
-        feedback_result = await self.feedback_agent.get_product_feedback_stats(product_id)
+        graph.add("feedback", lambda: self.feedback_agent.get_product_feedback_stats(product_id))
+        
+        # Step 2: Generate insights from the AI agent; the statistics are
+        # still returned when this is skipped or times out
+        graph.add(
+            "insights",
+            lambda feedback: self._generate_insights(product_id, feedback, deadline),
+            deps=("feedback",),
+            timeout=settings.AGENT_INSIGHTS_TIMEOUT_SECONDS,
+            optional=True,
+            min_budget=settings.DEADLINE_MIN_LLM_MS / 1000
+        )
+        
+        results = await self._run_graph(graph, deadline)
+        feedback_result = results["feedback"]
         
         # Handle possible error
         if "error" in feedback_result:
@@ -100,7 +262,30 @@ class AgentCoordinator:
                 "product_id": product_id
             }
         
-        # Step 2: Generate insights from the AI agent
+        insight_result = results["insights"] or {}
+        
+        # Step 3: Return combined insights
+        return {
+            "status": "success",
+            "product_id": product_id,
+            "feedback_statistics": feedback_result.get("feedback_stats", {}),
+            "ai_insights": insight_result.get("content", ""),
+            "agents_used": [
+                self.feedback_agent.agent_name,
+                self.ai_agent.agent_name if results["insights"] else None
+            ],
+            "timings": graph.timings,
+            "deadline": deadline.stats() if deadline else None
+        }
+    
+    async def _generate_insights(
+        self,
+        product_id: str,
+        feedback_result: Dict[str, Any],
+        deadline: Optional[Deadline] = None
+    ) -> Optional[Dict[str, Any]]:
+        if "error" in feedback_result:
+            return None
         feedback_stats = feedback_result.get("feedback_stats", {})
         
         insight_prompt = f"""
@@ -118,16 +303,4 @@ class AgentCoordinator:
         3. Suggestions for the types of customers this product might be good for
         """
         
-        insight_result = await self.ai_agent.generate_content(insight_prompt)
-        
-        # Step 3: Return combined insights
-        return {
-            "status": "success",
-            "product_id": product_id,
-            "feedback_statistics": feedback_stats,
-            "ai_insights": insight_result.get("content", ""),
-            "agents_used": [
-                self.feedback_agent.agent_name,
-                self.ai_agent.agent_name
-            ]
-        }
\ No newline at end of file
+        return await self.ai_agent.generate_content(insight_prompt, deadline)
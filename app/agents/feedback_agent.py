@@ -1,5 +1,7 @@
 from app.agents.base_agent import BaseAgent
-from app.services.feedback_analyzer import FeedbackAnalyzer
+from app.services.feedback_analyzer import FeedbackAnalyzer, AsyncFeedbackAnalyzer
+from app.database import run_query
+from app.services.request_context import RequestContext, memoized
 from sqlalchemy.orm import Session
 from typing import Dict, Set, List, Any, Optional
 import asyncio
@@ -7,10 +9,10 @@ import asyncio
 class FeedbackAnalyzerAgent(BaseAgent):
     """Agent for analyzing customer feedback and product reviews"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, service: Optional[FeedbackAnalyzer] = None):
         super().__init__()
         # Wrap the original FeedbackAnalyzer service
-        self.service = FeedbackAnalyzer(db)
+        self.service = service or FeedbackAnalyzer(db)
     
     @property
     def agent_name(self) -> str:
@@ -54,7 +56,7 @@ class FeedbackAnalyzerAgent(BaseAgent):
                 "rating": 0
             }
     
-    async def get_user_feedback_stats(self, user_id: str) -> Dict[str, Any]:
+    async def get_user_feedback_stats(self, user_id: str, context: Optional[RequestContext] = None) -> Dict[str, Any]:
         """Get statistics about a user's feedback history"""
         try:
             # Validate input
@@ -65,9 +67,15 @@ class FeedbackAnalyzerAgent(BaseAgent):
                     "feedback_stats": {}
                 }
                 
-            # Call the service method asynchronously
-            loop = asyncio.get_event_loop()
-            stats = await loop.run_in_executor(None, self.service.get_user_feedback_stats, user_id)
+            # Each lookup gets its own session; the request's session is not thread-safe
+            stats = await memoized(
+                context,
+                ("user_feedback", user_id),
+                lambda: run_query(
+                    lambda db: FeedbackAnalyzer(db).get_user_feedback_stats(user_id),
+                    lambda db: AsyncFeedbackAnalyzer(db).get_user_feedback_stats(user_id)
+                )
+            )
             
             # Log the activity
             self.log_activity("Retrieved user feedback statistics", {
@@ -179,6 +187,52 @@ class FeedbackAnalyzerAgent(BaseAgent):
                 "feedback_stats": {}
             }
     
+    async def get_products_feedback_stats(
+        self, 
+        product_ids: List[str], 
+        context: Optional[RequestContext] = None
+    ) -> Dict[str, Any]:
+        """Get feedback statistics for many products with one grouped query"""
+        try:
+            # Validate input
+            if not isinstance(product_ids, list) or not all(p and isinstance(p, str) for p in product_ids):
+                return {
+                    "agent": self.agent_name,
+                    "error": "Invalid product IDs",
+                    "feedback_stats": {}
+                }
+                
+            # Each lookup gets its own session; the request's session is not thread-safe
+            stats = await memoized(
+                context,
+                ("products_feedback", tuple(product_ids)),
+                lambda: run_query(
+                    lambda db: FeedbackAnalyzer(db).get_products_feedback_stats(product_ids),
+                    lambda db: AsyncFeedbackAnalyzer(db).get_products_feedback_stats(product_ids)
+                )
+            )
+            
+            # Log the activity
+            self.log_activity("Retrieved feedback statistics for products", {
+                "count": len(product_ids)
+            })
+            
+            # Return with agent metadata
+            return {
+                "agent": self.agent_name,
+                "feedback_stats": stats
+            }
+        except Exception as e:
+            self.log_activity("Error getting products feedback stats", {
+                "count": len(product_ids) if isinstance(product_ids, list) else 0,
+                "error": str(e)
+            })
+            return {
+                "agent": self.agent_name,
+                "error": f"Failed to get products feedback stats: {str(e)}",
+                "feedback_stats": {}
+            }
+    
     async def get_global_feedback_stats(self) -> Dict[str, Any]:
         """Get overall feedback statistics across all products"""
         try:
@@ -187,7 +241,9 @@ class FeedbackAnalyzerAgent(BaseAgent):
             stats = await loop.run_in_executor(None, self.service.get_global_feedback_stats)
             
             # Log the activity
-            self.log_activity("Retrieved global feedback statistics")
+            self.log_activity("Retrieved global feedback statistics", {
+                "total_feedbacks": stats.get("total_feedbacks", 0)
+            })
             
             # Return with agent metadata
             return {
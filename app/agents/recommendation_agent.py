@@ -1,16 +1,17 @@
 from app.agents.base_agent import BaseAgent
 from app.services.recommendation_service import RecommendationService
+from app.services.request_context import RequestContext
 from sqlalchemy.orm import Session
-from typing import Dict, List, Any, Optional
+from typing import AsyncIterator, Dict, List, Any, Optional, Tuple
 import asyncio
 
 class RecommendationAgent(BaseAgent):
     """Agent for generating product recommendations"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, service: Optional[RecommendationService] = None):
         super().__init__()
         # Wrap the original service
-        self.service = RecommendationService(db)
+        self.service = service or RecommendationService(db)
     
     @property
     def agent_name(self) -> str:
@@ -24,7 +25,8 @@ class RecommendationAgent(BaseAgent):
         self, 
         user_id: str, 
         query: Optional[str] = None, 
-        limit: int = 5
+        limit: int = 5,
+        context: Optional[RequestContext] = None
     ) -> Dict[str, Any]:
         """Get personalized recommendations for a user"""
         try:
@@ -40,12 +42,18 @@ class RecommendationAgent(BaseAgent):
                 limit = 5  # Reset to default if invalid
             
             # Call the service method (which is already async)
-            recommendations = await self.service.get_recommendations(user_id, query)
+            recommendations = await self.service.get_recommendations(user_id, query, context)
             
-            # If we need to limit results, do it here after receiving them
+            # If we need to limit results, do it here after receiving them.
+            # The result may come from the shared cache, so slice into a copy.
             if recommendations and "similar_products" in recommendations and limit != 5:
-                for key in recommendations["similar_products"]:
-                    recommendations["similar_products"][key] = recommendations["similar_products"][key][:limit]
+                recommendations = {
+                    **recommendations,
+                    "similar_products": {
+                        key: values[:limit] if values is not None else None
+                        for key, values in recommendations["similar_products"].items()
+                    }
+                }
             
             # Log the activity
             self.log_activity("Generated recommendations", {
@@ -62,7 +70,8 @@ class RecommendationAgent(BaseAgent):
                 "query": query if query else "None",
                 "recommendations_text": recommendations.get("recommendations", ""),
                 "products": recommendations.get("similar_products", {}),
-                "user_profile": recommendations.get("user_profile", {})
+                "user_profile": recommendations.get("user_profile", {}),
+                "degraded": recommendations.get("degraded", False)
             }
         except Exception as e:
             self.log_activity("Error generating recommendations", {
@@ -77,6 +86,37 @@ class RecommendationAgent(BaseAgent):
                 "products": {}
             }
     
+    async def stream_recommendations(
+        self, 
+        user_id: str, 
+        query: Optional[str] = None, 
+        limit: int = 5,
+        context: Optional[RequestContext] = None
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Stream recommendation events: products first, then text chunks"""
+        if limit < 1 or limit > 20:
+            limit = 5  # Reset to default if invalid
+        
+        async for event, data in self.service.stream_recommendations(user_id, query, context):
+            if event == "context":
+                data = {
+                    "agent": self.agent_name,
+                    "user_id": user_id,
+                    "query": query if query else "None",
+                    "user_profile": data["user_profile"],
+                    "products": {
+                        key: values[:limit] if values is not None else None
+                        for key, values in data["similar_products"].items()
+                    }
+                }
+            elif event == "done":
+                self.log_activity("Streamed recommendations", {
+                    "user_id": user_id,
+                    "query": query if query else "None",
+                    "limit": limit
+                })
+            yield event, data
+    
     async def get_user_profile(self, user_id: str) -> Dict[str, Any]:
         """Get user profile information"""
         try:
@@ -0,0 +1,36 @@
+from sqlalchemy.orm import Session
+from app.agents.ai_agent import AIAgent
+from app.agents.feedback_agent import FeedbackAnalyzerAgent
+from app.agents.vector_agent import VectorAgent
+from app.agents.recommendation_agent import RecommendationAgent
+from app.services.gemini_service import GeminiService
+from app.services.feedback_analyzer import FeedbackAnalyzer
+from app.services.recommendation_service import RecommendationService
+from functools import lru_cache
+
+
+class AgentRegistry:
+    """Application-scoped agents and the services they share.
+
+    Agents without per-request state are built once. Agents that query the
+    database are rebuilt for each request around the shared services, so
+    binding them only attaches the request's session.
+    """
+
+    def __init__(self):
+        self.gemini_service = GeminiService()
+        self.ai_agent = AIAgent(self.gemini_service)
+        # Opens the vector store on first search, not here
+        self.vector_agent = VectorAgent()
+
+    def feedback_agent(self, db: Session) -> FeedbackAnalyzerAgent:
+        return FeedbackAnalyzerAgent(db, FeedbackAnalyzer(db))
+
+    def recommendation_agent(self, db: Session) -> RecommendationAgent:
+        return RecommendationAgent(db, RecommendationService(db, self.gemini_service))
+
+
+@lru_cache()
+def get_agent_registry() -> AgentRegistry:
+    """Application-scoped agent registry"""
+    return AgentRegistry()
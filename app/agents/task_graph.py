@@ -0,0 +1,159 @@
+from app.services.telemetry import span
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class TaskGraphError(Exception):
+    """A required node failed, timed out or could not be scheduled"""
+
+    def __init__(self, node: str, message: str, status: str = "error"):
+        super().__init__(f"{node}: {message}")
+        self.node = node
+        # "error", "timeout" or "skipped"
+        self.status = status
+
+
+class TaskNode:
+    def __init__(
+        self,
+        name: str,
+        func: Callable[..., Awaitable[Any]],
+        deps: Sequence[str] = (),
+        timeout: Optional[float] = None,
+        optional: bool = False,
+        min_budget: float = 0.0,
+        grace: float = 0.0
+    ):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.timeout = timeout
+        self.optional = optional
+        # Optional nodes are skipped when less than this many seconds remain
+        self.min_budget = min_budget
+        # Extra seconds past the budget for nodes that degrade on their own at
+        # the deadline, so they get to return their degraded result
+        self.grace = grace
+
+
+class TaskGraph:
+    """Runs async steps as soon as the steps they depend on have finished.
+
+    Each node's function is called with the results of its dependencies as
+    keyword arguments, so independent nodes run concurrently. A node that
+    fails or times out fails the whole graph unless it is optional; an
+    optional node instead yields None to its dependents, and is skipped
+    outright when the remaining budget is below its min_budget.
+    """
+
+    def __init__(self, name: str = "task_graph", budget: Optional[float] = None):
+        # Prefix of the stage name each node is timed under
+        self.name = name
+        self.nodes: Dict[str, TaskNode] = {}
+        self.budget = budget
+        self.timings: Dict[str, Dict] = {}
+
+    def add(
+        self,
+        name: str,
+        func: Callable[..., Awaitable[Any]],
+        deps: Sequence[str] = (),
+        timeout: Optional[float] = None,
+        optional: bool = False,
+        min_budget: float = 0.0,
+        grace: float = 0.0
+    ) -> "TaskGraph":
+        if name in self.nodes:
+            raise ValueError(f"Duplicate task node: {name}")
+        self.nodes[name] = TaskNode(name, func, deps, timeout, optional, min_budget, grace)
+        return self
+
+    def _order(self) -> List[str]:
+        """Node names with every node after its dependencies"""
+        order: List[str] = []
+        visiting = set()
+
+        def visit(name: str) -> None:
+            if name in order:
+                return
+            if name in visiting:
+                raise ValueError(f"Task graph has a cycle through {name}")
+            if name not in self.nodes:
+                raise ValueError(f"Unknown task node: {name}")
+            visiting.add(name)
+            for dep in self.nodes[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            order.append(name)
+
+        for name in self.nodes:
+            visit(name)
+        return order
+
+    async def run(self) -> Dict[str, Any]:
+        """Run every node and return the results by node name"""
+        self.timings = {}
+        with span(self.name):
+            started = time.perf_counter()
+            tasks: Dict[str, asyncio.Future] = {}
+            for name in self._order():
+                node = self.nodes[name]
+                # Created inside the graph's span, so node spans are its children
+                tasks[name] = asyncio.ensure_future(
+                    self._run_node(node, [(dep, tasks[dep]) for dep in node.deps], started)
+                )
+            try:
+                results = await asyncio.gather(*tasks.values())
+            except BaseException:
+                for task in tasks.values():
+                    task.cancel()
+                raise
+            return dict(zip(tasks, results))
+
+    def _remaining(self, started: float) -> Optional[float]:
+        if self.budget is None:
+            return None
+        return self.budget - (time.perf_counter() - started)
+
+    async def _run_node(self, node: TaskNode, deps: List, started: float) -> Any:
+        dep_results = await asyncio.gather(*(task for _, task in deps))
+        kwargs = {name: result for (name, _), result in zip(deps, dep_results)}
+
+        node_start = time.perf_counter()
+        timeout = node.timeout
+        remaining = self._remaining(started)
+        if remaining is not None:
+            if remaining <= 0 or (node.optional and remaining < node.min_budget):
+                return self._finish(node, "skipped", node_start, started)
+            limit = remaining + node.grace
+            timeout = limit if timeout is None else min(timeout, limit)
+
+        try:
+            with span(f"{self.name}.{node.name}"):
+                result = await asyncio.wait_for(node.func(**kwargs), timeout)
+        except asyncio.TimeoutError:
+            return self._finish(node, "timeout", node_start, started)
+        except Exception as e:
+            return self._finish(node, "error", node_start, started, e)
+        self._finish(node, "ok", node_start, started)
+        return result
+
+    def _finish(self, node: TaskNode, status: str, node_start: float, started: float, error: Exception = None):
+        now = time.perf_counter()
+        self.timings[node.name] = {
+            "status": status,
+            "start_ms": round((node_start - started) * 1000, 2),
+            "duration_ms": round((now - node_start) * 1000, 2)
+        }
+        if status == "ok":
+            return None
+        if error is not None:
+            self.timings[node.name]["error"] = str(error)
+        if not node.optional:
+            raise TaskGraphError(node.name, str(error) if error is not None else status, status)
+        logger.warning(f"Optional task {node.name} {status}" + (f": {error}" if error else ""))
+        return None
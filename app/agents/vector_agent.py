@@ -1,6 +1,8 @@
 from app.agents.base_agent import BaseAgent
-from app.services.vector_store import VectorStore
-from typing import Dict, List, Any
+from app.services.vector_store import get_vector_store
+from app.services.readiness import get_readiness
+from app.services.request_context import RequestContext, search_products
+from typing import Dict, List, Any, Optional
 import asyncio
 
 class VectorAgent(BaseAgent):
@@ -8,8 +10,11 @@ class VectorAgent(BaseAgent):
     
     def __init__(self):
         super().__init__()
-        # Wrap the original service
-        self.service = VectorStore()
+    
+    @property
+    def service(self):
+        # Wrap the original service, opened on first use
+        return get_vector_store()
     
     @property
     def agent_name(self) -> str:
@@ -19,7 +24,12 @@ class VectorAgent(BaseAgent):
     def agent_role(self) -> str:
         return "I perform semantic search and help find products similar to what users are looking for."
     
-    async def search_similar_products(self, query: str, n_results: int = 5) -> Dict[str, Any]:
+    async def search_similar_products(
+        self, 
+        query: str, 
+        n_results: int = 5, 
+        context: Optional[RequestContext] = None
+    ) -> Dict[str, Any]:
         """Search for products similar to the query"""
         try:
             # Validate input
@@ -29,14 +39,18 @@ class VectorAgent(BaseAgent):
                     "error": "Invalid query",
                     "results": []
                 }
+            
+            if not get_readiness().vector_ready:
+                return {
+                    "agent": self.agent_name,
+                    "query": query,
+                    "error": "Vector index is still loading",
+                    "results": []
+                }
                 
 
-            loop = asyncio.get_event_loop()
-            # Call the service method asynchronously
-            results = await loop.run_in_executor(
-                None, 
-                lambda: self.service.search_similar_products(query, n_results)
-            )
+            # Reuses the embedding and ANN hits of other agents in the same request
+            results = await search_products(context, self.service, query, n_results)
             
             # Log the activity
             self.log_activity("Performed semantic search", {
@@ -44,32 +58,11 @@ class VectorAgent(BaseAgent):
                 "n_results": n_results
             })
             
-            # Process results to make them more useful
-            processed_results = []
-            if "ids" in results and results["ids"]:
-                for i in range(len(results["ids"])):
-                    product_id = results["ids"][i]
-                    metadata = results["metadatas"][i] if "metadatas" in results and i < len(results["metadatas"]) else {}
-                    document = results["documents"][i] if "documents" in results and i < len(results["documents"]) else ""
-                    distance = results["distances"][i] if "distances" in results and results["distances"] and i < len(results["distances"]) else None
-                    
-                    # Calculate relevance score (1.0 is exact match, 0.0 is completely unrelated)
-                    relevance = 1.0 - (distance / 2.0) if distance is not None else 1.0
-                    relevance = max(0.0, min(1.0, relevance))  # Clamp to 0-1 range
-                    
-                    processed_results.append({
-                        "id": product_id,
-                        "document": document,
-                        "metadata": metadata,
-                        "relevance": round(relevance, 2),
-                        "distance": distance
-                    })
-            
             # Return with agent metadata
             return {
                 "agent": self.agent_name,
                 "query": query,
-                "results": processed_results
+                "results": self._process_results(results)
             }
         except Exception as e:
             self.log_activity("Error performing semantic search", {
@@ -83,6 +76,84 @@ class VectorAgent(BaseAgent):
                 "results": []
             }
     
+    def _process_results(self, results: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Process raw vector store results to make them more useful"""
+        processed_results = []
+        if "ids" in results and results["ids"]:
+            for i in range(len(results["ids"])):
+                product_id = results["ids"][i]
+                metadata = results["metadatas"][i] if "metadatas" in results and i < len(results["metadatas"]) else {}
+                document = results["documents"][i] if "documents" in results and i < len(results["documents"]) else ""
+                distance = results["distances"][i] if "distances" in results and results["distances"] and i < len(results["distances"]) else None
+                
+                # Calculate relevance score (1.0 is exact match, 0.0 is completely unrelated)
+                relevance = 1.0 - (distance / 2.0) if distance is not None else 1.0
+                relevance = max(0.0, min(1.0, relevance))  # Clamp to 0-1 range
+                
+                processed_results.append({
+                    "id": product_id,
+                    "document": document,
+                    "metadata": metadata,
+                    "relevance": round(relevance, 2),
+                    "distance": distance
+                })
+        return processed_results
+    
+    async def search_many(
+        self, 
+        queries: List[str], 
+        n_results: int = 5, 
+        where: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Search for products similar to each query in a single batched call"""
+        try:
+            # Validate input
+            if not queries or not all(q and isinstance(q, str) for q in queries):
+                return {
+                    "agent": self.agent_name,
+                    "error": "Invalid queries",
+                    "results": []
+                }
+            
+            if not get_readiness().vector_ready:
+                return {
+                    "agent": self.agent_name,
+                    "error": "Vector index is still loading",
+                    "results": []
+                }
+            
+            loop = asyncio.get_event_loop()
+            # Call the service method asynchronously
+            batch_results = await loop.run_in_executor(
+                None, 
+                lambda: self.service.search_many(queries, n_results, where=where)
+            )
+            
+            # Log the activity
+            self.log_activity("Performed batched semantic search", {
+                "num_queries": len(queries),
+                "n_results": n_results
+            })
+            
+            # Return with agent metadata
+            return {
+                "agent": self.agent_name,
+                "results": [
+                    {"query": query, "results": self._process_results(results)}
+                    for query, results in zip(queries, batch_results)
+                ]
+            }
+        except Exception as e:
+            self.log_activity("Error performing batched semantic search", {
+                "num_queries": len(queries) if queries else 0,
+                "error": str(e)
+            })
+            return {
+                "agent": self.agent_name,
+                "error": f"Failed to perform batched semantic search: {str(e)}",
+                "results": []
+            }
+    
     async def add_products(self, products: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Add products to the vector store"""
         try:
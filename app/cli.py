@@ -0,0 +1,124 @@
+"""Maintenance commands.
+
+Usage:
+    python -m app.cli migrate
+    python -m app.cli seed --users 100000 --products 100000 --behaviors 100000000 --seed 42
+    python -m app.cli ingest-vectors [--restart]
+    python -m app.cli sync-vectors
+    python -m app.cli rebuild-feedback-aggregates
+"""
+import argparse
+
+from app.database import SessionLocal, Base, engine, ensure_columns, ensure_indexes, create_tables
+from app.services.feedback_analyzer import FeedbackAnalyzer
+from app.services.vector_ingest import VectorIngestor
+from app.services.vector_sync import VectorSync
+from app.utils.bulk_loader import BulkLoader
+from app.utils.data_generator import DataGenerator
+
+
+def migrate(args) -> None:
+    """Create missing tables, columns and indexes in an existing database"""
+    Base.metadata.create_all(bind=engine)
+    added = ensure_columns()
+    created = ensure_indexes()
+    if added:
+        print(f"✅ Added columns: {', '.join(added)}")
+    if created:
+        print(f"✅ Created indexes: {', '.join(created)}")
+    if not added and not created:
+        print("✅ Schema is up to date")
+
+
+def seed(args) -> None:
+    """Stream a synthetic dataset into the database in constant memory"""
+    create_tables()
+    generator = DataGenerator(
+        seed=args.seed,
+        product_popularity_exponent=args.product_skew,
+        user_activity_exponent=args.user_skew
+    )
+    counts = BulkLoader(chunk_size=args.chunk_size).load_generated(
+        generator.stream_bulk_data(args.users, args.products, args.behaviors, chunk_size=args.chunk_size)
+    )
+    print(f"✅ Seeded {counts['users']} users, {counts['products']} products, "
+          f"{counts['user_behaviors']} user behaviors (seed {generator.seed})")
+
+
+def ingest_vectors(args) -> None:
+    """Embed the products table into the vector store, resuming an interrupted run"""
+    create_tables()
+    stats = VectorIngestor(batch_size=args.batch_size, workers=args.workers).run(restart=args.restart)
+    print(f"✅ Ingested {stats['this_run']} products in {stats['seconds']}s "
+          f"({stats['products_per_second']} products/s, {stats['ingested']} total)")
+
+
+def sync_vectors(args) -> None:
+    """Apply product changes since the last sync to the vector store"""
+    create_tables()
+    stats = VectorSync().run()
+    print(f"✅ Synced vector store: {stats['embedded']} embedded, "
+          f"{stats['metadata_updated']} metadata updates, {stats['deleted']} deleted in {stats['seconds']}s")
+
+
+def rebuild_feedback_aggregates(args) -> None:
+    """Recompute the feedback histogram and per-product/per-user aggregates"""
+    create_tables()
+    db = SessionLocal()
+    try:
+        stats = FeedbackAnalyzer(db).rebuild_aggregates()
+        print(f"✅ Rebuilt feedback aggregates from {stats['total_feedbacks']} feedbacks")
+    finally:
+        db.close()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Shopiz maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    migrate_parser = subparsers.add_parser(
+        "migrate",
+        help="Create missing tables, columns and indexes (safe to run repeatedly)"
+    )
+    migrate_parser.set_defaults(func=migrate)
+
+    seed_parser = subparsers.add_parser(
+        "seed",
+        help="Generate and bulk load a synthetic dataset (products are not added to the vector store)"
+    )
+    seed_parser.add_argument("--users", type=int, default=200)
+    seed_parser.add_argument("--products", type=int, default=2000)
+    seed_parser.add_argument("--behaviors", type=int, default=10000)
+    seed_parser.add_argument("--seed", type=int, default=None, help="random seed for a reproducible dataset")
+    seed_parser.add_argument("--product-skew", type=float, default=1.1, help="Zipf exponent of product popularity")
+    seed_parser.add_argument("--user-skew", type=float, default=1.0, help="power-law exponent of user activity")
+    seed_parser.add_argument("--chunk-size", type=int, default=10000)
+    seed_parser.set_defaults(func=seed)
+
+    ingest = subparsers.add_parser(
+        "ingest-vectors",
+        help="Embed products in parallel and upsert them into the vector store (resumable)"
+    )
+    ingest.add_argument("--batch-size", type=int, default=None)
+    ingest.add_argument("--workers", type=int, default=None, help="embedding processes (1 embeds in a thread)")
+    ingest.add_argument("--restart", action="store_true", help="ignore the checkpoint and ingest every product")
+    ingest.set_defaults(func=ingest_vectors)
+
+    sync = subparsers.add_parser(
+        "sync-vectors",
+        help="Upsert changed products and remove deleted ones from the vector store"
+    )
+    sync.set_defaults(func=sync_vectors)
+
+    rebuild = subparsers.add_parser(
+        "rebuild-feedback-aggregates",
+        help="Recompute materialized feedback aggregates from the feedback table"
+    )
+    rebuild.set_defaults(func=rebuild_feedback_aggregates)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,58 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Optional
 
 class Settings(BaseSettings):
     GEMINI_API_KEY: str 
     DATABASE_URL: str = "sqlite:///./ecommerce.db"
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800  # seconds, -1 disables
+    DB_POOL_PRE_PING: bool = False
+    SQLITE_MMAP_SIZE: int = 268435456  # 256 MiB
+    SQLITE_CACHE_SIZE: int = -65536  # negative means KiB, i.e. 64 MiB
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    DB_THREADPOOL_SIZE: int = 16
+    DB_ASYNC_ENABLED: bool = False
+    ASYNC_DATABASE_URL: Optional[str] = None  # derived from DATABASE_URL when unset
+    BULK_LOAD_CHUNK_SIZE: int = 10000
+    BULK_LOAD_PROGRESS_EVERY: int = 100000
     MODEL_NAME: str = "gemini-1.5-flash"
     VECTOR_DB_PATH: str = "./chroma_db"
+    VECTOR_QUERY_BATCH_SIZE: int = 512
+    VECTOR_INGEST_BATCH_SIZE: int = 512
+    VECTOR_INGEST_WORKERS: Optional[int] = None  # defaults to the CPU count; 1 embeds in a thread
+    VECTOR_SYNC_INTERVAL_SECONDS: float = 60
+    VECTOR_LOAD_RETRY_BASE_SECONDS: float = 5  # doubles after each failed load at startup
+    VECTOR_LOAD_RETRY_MAX_SECONDS: float = 300
+    EMBEDDING_CACHE_SIZE: int = 4096
+    EMBEDDING_CACHE_PATH: Optional[str] = None
+    CATEGORY_INDEX_TOP_N: int = 50
+    CATEGORY_INDEX_REFRESH_SECONDS: float = 600
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_TIMEOUT_SECONDS: float = 20
+    LLM_QUEUE_TIMEOUT_SECONDS: float = 2
+    LLM_MAX_RETRIES: int = 2
+    LLM_BACKOFF_BASE_SECONDS: float = 0.5
+    LLM_WARMUP_ON_STARTUP: bool = False  # sends one tiny prompt once the app is ready
+    LLM_CACHE_BACKEND: str = "memory"  # "memory" or "sqlite"
+    LLM_CACHE_PATH: str = "./llm_cache.db"
+    LLM_CACHE_SIZE: int = 2048
+    LLM_CACHE_TTL_SECONDS: float = 3600
+    PROFILE_WINDOW_DAYS: Optional[int] = None  # None counts all behaviors
+    PROFILE_CACHE_SIZE: int = 10000
+    PROFILE_CACHE_TTL_SECONDS: float = 600
+    RECOMMENDATION_CACHE_SIZE: int = 10000
+    RECOMMENDATION_CACHE_TTL_SECONDS: float = 300
+    AGENT_STEP_TIMEOUT_SECONDS: float = 5  # optional enrichment steps of the agent coordinator
+    AGENT_INSIGHTS_TIMEOUT_SECONDS: float = 30
+    REQUEST_DEADLINE_MS: int = 30000  # default end-to-end budget; deadline_ms / X-Request-Deadline-Ms override it
+    DEADLINE_MIN_LLM_MS: int = 1500  # LLM text and insights are skipped with less time left
+    DEADLINE_MIN_VECTOR_MS: int = 200  # below this, candidates come from SQL instead of vector search
+    DEADLINE_GRACE_MS: int = 250  # time past the deadline for a step to return its degraded result
+    OTEL_ENABLED: bool = False  # export spans over OTLP, configured by the OTEL_EXPORTER_OTLP_* variables
+    OTEL_SERVICE_NAME: str = "shopiz"
     
     class Config:
         env_file = ".env"
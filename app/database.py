@@ -1,17 +1,115 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.schema import CreateColumn
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from concurrent.futures import ThreadPoolExecutor
+from app.config import get_settings
+from typing import AsyncIterator, Dict, Optional
+import asyncio
 import os
+import threading
+import time
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./ecommerce.db"
+settings = get_settings()
+
+SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
+IS_SQLITE = SQLALCHEMY_DATABASE_URL.startswith("sqlite")
 
 # Delete database file if it exists
 #if os.path.exists("./ecommerce.db"):
 #    os.remove("./ecommerce.db")
 
+class PoolMetrics:
+    """Connection pool checkout and wait counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.waits = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.waits += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def attach(self, engine) -> None:
+        """Count connects, checkouts and checkins of an engine's pool"""
+        event.listen(engine, "connect", lambda *args: self._incr("connects"))
+        event.listen(engine, "checkout", lambda *args: self._incr("checkouts"))
+        event.listen(engine, "checkin", lambda *args: self._incr("checkins"))
+
+    def _incr(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def stats(self, engine=None) -> Dict:
+        stats = {
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            "checkins": self.checkins,
+            "in_use": self.checkouts - self.checkins,
+            "waits": self.waits,
+            "wait_seconds_total": round(self.wait_seconds_total, 6),
+            "wait_seconds_max": round(self.wait_seconds_max, 6),
+            "wait_seconds_avg": round(self.wait_seconds_total / self.waits, 6) if self.waits else 0.0
+        }
+        if engine is not None:
+            stats["pool"] = engine.pool.status()
+        return stats
+
+pool_metrics = PoolMetrics()
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that times checkouts that found no idle connection"""
+
+    # Where waits are recorded; subclasses for other engines point elsewhere
+    metrics = pool_metrics
+
+    def _do_get(self):
+        # Checkouts served from an idle connection are not waits
+        if self.checkedin() > 0:
+            return super()._do_get()
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.metrics.record_wait(time.perf_counter() - start)
+
+def _pool_options() -> Dict:
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING
+    }
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """WAL lets readers proceed during writes; NORMAL sync is safe under WAL"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+    cursor.execute(f"PRAGMA cache_size={int(settings.SQLITE_CACHE_SIZE)}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.close()
+
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+    SQLALCHEMY_DATABASE_URL,
+    poolclass=InstrumentedQueuePool,
+    connect_args={"check_same_thread": False} if IS_SQLITE else {},
+    **_pool_options()
 )
+pool_metrics.attach(engine)
+if IS_SQLITE:
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -20,3 +118,121 @@ Base = declarative_base()
 # Create tables
 def create_tables():
     Base.metadata.create_all(bind=engine)
+    ensure_columns()
+    ensure_indexes()
+
+def ensure_columns() -> list:
+    """Add columns declared in the models but missing from existing tables.
+
+    Only suitable for nullable columns without a server default, which is
+    how new columns are added to the models.
+    """
+    added = []
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspect(conn).get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    ddl = CreateColumn(column).compile(dialect=conn.dialect)
+                    conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+                    added.append(f"{table.name}.{column.name}")
+    return added
+
+def ensure_indexes() -> list:
+    """Create indexes declared in the models but missing from an existing database.
+
+    create_all only creates indexes together with new tables, so databases
+    created before an index was added need this migration step.
+    """
+    created = []
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {index["name"] for index in inspect(conn).get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(bind=conn)
+                    created.append(index.name)
+        # Refresh planner statistics so the new indexes get picked up
+        if created and IS_SQLITE:
+            conn.exec_driver_sql("ANALYZE")
+    return created
+
+# Dedicated pool for blocking ORM work, so concurrent queries do not compete
+# with other executor users and never run on the event loop
+db_executor = ThreadPoolExecutor(
+    max_workers=settings.DB_THREADPOOL_SIZE,
+    thread_name_prefix="db"
+)
+
+async def run_in_session(fn, *args, **kwargs):
+    """Run fn(session, *args, **kwargs) in the DB pool with its own session"""
+    def call():
+        session = SessionLocal()
+        try:
+            return fn(session, *args, **kwargs)
+        finally:
+            session.close()
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, call)
+
+
+def to_async_url(url: str) -> str:
+    """Map a sync database URL to the matching async driver"""
+    for sync_prefix, async_prefix in (
+        ("sqlite://", "sqlite+aiosqlite://"),
+        ("postgresql+psycopg2://", "postgresql+asyncpg://"),
+        ("postgresql://", "postgresql+asyncpg://"),
+        ("postgres://", "postgresql+asyncpg://"),
+    ):
+        if url.startswith(sync_prefix):
+            return async_prefix + url[len(sync_prefix):]
+    return url
+
+# Optional async engine (aiosqlite / asyncpg), enabled with DB_ASYNC_ENABLED
+async_engine = None
+AsyncSessionLocal: Optional[async_sessionmaker] = None
+
+async_pool_metrics = PoolMetrics()
+
+class InstrumentedAsyncAdaptedQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that times waits into async_pool_metrics"""
+
+    metrics = async_pool_metrics
+
+if settings.DB_ASYNC_ENABLED:
+    async_engine = create_async_engine(
+        settings.ASYNC_DATABASE_URL or to_async_url(SQLALCHEMY_DATABASE_URL),
+        poolclass=InstrumentedAsyncAdaptedQueuePool,
+        **_pool_options()
+    )
+    async_pool_metrics.attach(async_engine.sync_engine)
+    if IS_SQLITE:
+        event.listen(async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+async def get_async_db() -> AsyncIterator[Optional[AsyncSession]]:
+    """Yields an AsyncSession, or None when the async engine is disabled"""
+    if AsyncSessionLocal is None:
+        yield None
+        return
+    async with AsyncSessionLocal() as session:
+        yield session
+
+async def run_query(sync_fn, async_fn=None):
+    """Run a read with the async engine when enabled, else in the DB pool.
+
+    sync_fn receives a Session, async_fn an AsyncSession; each call gets a
+    session of its own so concurrent callers never share one.
+    """
+    if async_fn is not None and AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as session:
+            return await async_fn(session)
+    return await run_in_session(sync_fn)
+
+def get_pool_stats() -> Dict:
+    """Checkout/wait metrics of the sync and (if enabled) async engine pools"""
+    stats = {"sync": pool_metrics.stats(engine)}
+    if async_engine is not None:
+        stats["async"] = async_pool_metrics.stats(async_engine.sync_engine)
+    return stats
@@ -1,19 +1,42 @@
 import os
-from fastapi import FastAPI, Depends, HTTPException
+import asyncio
+from fastapi import FastAPI, Depends, Header, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List, Dict
+from typing import List, Dict, Optional
 from fastapi.middleware.cors import CORSMiddleware
-from .database import SessionLocal, engine, Base, create_tables
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from .database import SessionLocal, create_tables, db_executor, get_async_db, run_in_session, async_engine, get_pool_stats
 from .models import User, Product, UserBehavior, RecommendationFeedback
-from .schemas import UserBase, ProductBase, RecommendationFeedbackCreate, RecommendationFeedbackRead
+from .schemas import UserBase, ProductBase, UserBehaviorBase, UserBehaviorCreate, RecommendationFeedbackCreate, RecommendationFeedbackRead, SemanticSearchBatchRequest
 from .services.recommendation_service import RecommendationService
+from .services.feedback_analyzer import FeedbackAnalyzer
 from .utils.data_generator import DataGenerator
-from .services.vector_store import VectorStore
+from .utils.bulk_loader import BulkLoader
+from .services.vector_store import get_vector_store, opened_vector_store, close_vector_store
+from .services.vector_ingest import VectorIngestor, ingestion_pending
+from .services.vector_sync import get_vector_sync, run_vector_sync
+from .services.category_index import get_category_index, refresh_category_index, run_category_index_refresh
+from .services.cache import get_recommendation_cache, get_embedding_cache, get_llm_response_cache, get_profile_cache
+from .services.llm_client import get_llm_client
+from .services.readiness import get_readiness
+from .services.deadline import Deadline, get_deadline_stats
+from .services.telemetry import get_telemetry, setup_tracing
+from .services.request_context import RequestContext
+from .config import get_settings
 from app.agents.coordinator import AgentCoordinator
+from app.agents.registry import get_agent_registry
+from app.agents.task_graph import TaskGraphError
 import uuid
+import json
+import logging
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
 app = FastAPI()
+setup_tracing(app)
 
 # Create tables when the application starts
 create_tables()
@@ -27,6 +50,36 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Long-running tasks started at startup, cancelled on shutdown
+background_tasks: List[asyncio.Task] = []
+
+def format_sse(event: str, data: Dict) -> str:
+    """Encode one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+async def sse_response(events) -> StreamingResponse:
+    """Start an event stream, surfacing errors before the first byte as HTTP errors"""
+    try:
+        first_event = await events.__anext__()
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def body():
+        yield format_sse(*first_event)
+        try:
+            async for event, data in events:
+                yield format_sse(event, data)
+        except Exception as e:
+            yield format_sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 def get_db():
     db = SessionLocal()
     try:
@@ -34,118 +87,303 @@ def get_db():
     finally:
         db.close()
 
-@app.on_event("startup")
-async def startup_event():
-    db_path = "./ecommerce.db"
-    chroma_path = "./chroma_db"
-    
-    # Check if database and vector store exist
-    db_exists = os.path.exists(db_path)
-    vector_store_exists = os.path.exists(chroma_path)
+def get_deadline(
+    deadline_ms: Optional[int] = Query(None, gt=0),
+    x_request_deadline_ms: Optional[int] = Header(None, gt=0)
+) -> Deadline:
+    """Per-request time budget: query param, then header, then the configured default"""
+    return Deadline(deadline_ms or x_request_deadline_ms or get_settings().REQUEST_DEADLINE_MS)
+
+def graph_error(e: TaskGraphError) -> HTTPException:
+    # A required step that ran out of time is a gateway timeout, not a server bug
+    return HTTPException(status_code=500 if e.status == "error" else 504, detail=str(e))
+
+def prepare_database() -> None:
+    """Seed a new database and bring the feedback aggregates up to date"""
+    # Tables already exist (create_tables runs at import), so seed when they are empty
+    db = SessionLocal()
+    try:
+        has_data = (
+            db.execute(select(User.id).limit(1)).first() is not None
+            or db.execute(select(Product.id).limit(1)).first() is not None
+        )
+    finally:
+        db.close()
     
-    if not db_exists or not vector_store_exists:
-        print("Database or vector store not found. Initializing...")
-        
-        # Create database tables
-        Base.metadata.create_all(bind=engine)
+    if not has_data:
+        print("Database is empty. Initializing...")
         
         # Generate test data
-        db = SessionLocal()
         data_generator = DataGenerator()
-        vector_store = VectorStore()
         
         try:
             print("Generating dummy data...")
             
-            dummy_data = data_generator.generate_bulk_data(
+            # Rows are generated and inserted chunk by chunk in one transaction
+            counts = BulkLoader().load_generated(data_generator.stream_bulk_data(
                 num_users=200,
                 num_products=2000,
                 num_behaviors=10000
-            )
-            
-            # Add Users
-            users = [User(**u) for u in dummy_data["users"]]
-            db.bulk_save_objects(users)
-            
-            # Add Products
-            products = [Product(**p) for p in dummy_data["products"]]
-            db.bulk_save_objects(products)
-            
-            # Add User Behaviors
-            behaviors = [UserBehavior(**b) for b in dummy_data["user_behaviors"]]
-            db.bulk_save_objects(behaviors)
+            ))
             
-            # Add Products to Vector Store
-            print("Adding products to vector store... (It may take a while)")
-            vector_store.add_products(dummy_data["products"])
-            
-            db.commit()
             print("✅ Dummy data generation completed successfully!")
             print(f"Generated:")
-            print(f"- {len(users)} users")
-            print(f"- {len(products)} products")
-            print(f"- {len(behaviors)} user behaviors")
+            print(f"- {counts['users']} users")
+            print(f"- {counts['products']} products")
+            print(f"- {counts['user_behaviors']} user behaviors")
             
         except Exception as e:
             print(f"❌ Error generating dummy data: {e}")
-            db.rollback()
             raise e
-        finally:
-            db.close()
+
+    # Aggregates are missing for databases created before they existed
+    db = SessionLocal()
+    try:
+        feedback_analyzer = FeedbackAnalyzer(db)
+        if feedback_analyzer.aggregates_out_of_date():
+            feedback_analyzer.rebuild_aggregates()
+    finally:
+        db.close()
+
+def load_vector_index(ingest: bool) -> None:
+    """Fill or finish the vector store, then load it and the category index"""
+    # Fill a new vector store, or finish an ingestion that was interrupted
+    if ingest or ingestion_pending():
+        print("Adding products to vector store...")
+        stats = VectorIngestor(get_vector_store()).run()
+        print(f"✅ Ingested {stats['this_run']} products ({stats['products_per_second']} products/s)")
+    
+    # Open Chroma and load the embedding model once for the whole process
+    get_vector_store().warmup()
+    
+    # Precompute default candidates per category
+    refresh_category_index()
+
+async def warm_llm() -> None:
+    """Configure Gemini and optionally open a connection with a tiny prompt"""
+    settings = get_settings()
+    client = get_llm_client()
+    get_llm_response_cache()
+    # Agents and their shared services, so no request has to build them
+    get_agent_registry()
+    if settings.LLM_WARMUP_ON_STARTUP:
+        try:
+            await client.generate("ping", timeout=settings.LLM_TIMEOUT_SECONDS)
+        except Exception as e:
+            logger.warning(f"LLM warmup failed: {str(e)}")
+
+async def load_vector_index_with_retry(ingest: bool) -> None:
+    """Load the vector index, retrying with exponential backoff until it succeeds.
+
+    SQL-only recommendations keep being served meanwhile, and /health
+    reports the last failure.
+    """
+    settings = get_settings()
+    readiness = get_readiness()
+    loop = asyncio.get_running_loop()
+    delay = settings.VECTOR_LOAD_RETRY_BASE_SECONDS
+    while True:
+        try:
+            await loop.run_in_executor(None, load_vector_index, ingest)
+            return
+        except Exception as e:
+            logger.error(f"Loading the vector index failed, retrying in {delay:.0f}s: {str(e)}")
+            readiness.fail(str(e))
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, settings.VECTOR_LOAD_RETRY_MAX_SECONDS)
+
+async def initialize() -> None:
+    """Bring the app from serving SQL-only results to fully ready, phase by phase"""
+    settings = get_settings()
+    readiness = get_readiness()
+    loop = asyncio.get_running_loop()
+    # Decided before anything below creates the directory
+    vector_store_exists = os.path.exists(settings.VECTOR_DB_PATH)
+    try:
+        await loop.run_in_executor(None, prepare_database)
+        readiness.advance("db_ready")
+        
+        readiness.advance("index_loading")
+        await load_vector_index_with_retry(not vector_store_exists)
+        readiness.advance("index_ready")
+        
+        # Keep the category index fresh and propagate product changes
+        background_tasks.append(asyncio.create_task(
+            run_category_index_refresh(settings.CATEGORY_INDEX_REFRESH_SECONDS)
+        ))
+        background_tasks.append(asyncio.create_task(
+            run_vector_sync(settings.VECTOR_SYNC_INTERVAL_SECONDS)
+        ))
+        
+        await warm_llm()
+        readiness.advance("llm_warmed")
+    except Exception as e:
+        logger.error(f"Startup initialization failed in phase {readiness.phase}: {str(e)}")
+        readiness.fail(str(e))
+
+@app.on_event("startup")
+async def startup_event():
+    # Accept traffic immediately; /ready reports when initialization is done
+    background_tasks.append(asyncio.create_task(initialize()))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    for task in background_tasks:
+        task.cancel()
+    get_embedding_cache().save()
+    close_vector_store()
+    db_executor.shutdown(wait=False)
+    if async_engine is not None:
+        await async_engine.dispose()
 
 @app.get("/recommendations/{user_id}")
 async def get_recommendations(
     user_id: str,
     query: str = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    deadline: Deadline = Depends(get_deadline)
 ) -> Dict:
     try:
-        recommendation_service = RecommendationService(db)
+        recommendation_service = RecommendationService(db, get_agent_registry().gemini_service)
         recommendations = await recommendation_service.get_recommendations(
             user_id=user_id,
-            query=query
+            query=query,
+            context=RequestContext(deadline)
         )
         return recommendations
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/recommendations/{user_id}/stream")
+async def stream_recommendations(
+    user_id: str,
+    query: str = None,
+    db: Session = Depends(get_db),
+    deadline: Deadline = Depends(get_deadline)
+):
+    """Stream recommendations as server-sent events"""
+    recommendation_service = RecommendationService(db, get_agent_registry().gemini_service)
+    return await sse_response(
+        recommendation_service.stream_recommendations(
+            user_id=user_id, query=query, context=RequestContext(deadline)
+        )
+    )
+
 @app.post("/feedback", response_model=RecommendationFeedbackRead)
 def submit_feedback(feedback: RecommendationFeedbackCreate, db: Session = Depends(get_db)):
     try:
-        # Create feedback with generated UUID
-        db_feedback = RecommendationFeedback(
-            id=str(uuid.uuid4()),
+        # Create feedback and update the aggregates in one transaction
+        db_feedback = FeedbackAnalyzer(db).record_feedback(
             user_id=feedback.user_id,
-            product_id=feedback.product_id,  
-            rating=feedback.rating,          
-            feedback=feedback.feedback,
-            created_at=datetime.utcnow()
+            product_id=feedback.product_id,
+            rating=feedback.rating,
+            feedback=feedback.feedback
         )
-        db.add(db_feedback)
         db.commit()
         db.refresh(db_feedback)
+        # New feedback changes which products are filtered out for this user
+        get_recommendation_cache().invalidate_user(feedback.user_id)
         return db_feedback
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/behaviors", response_model=UserBehaviorBase)
+def record_behavior(behavior: UserBehaviorCreate, db: Session = Depends(get_db)):
+    try:
+        product = db.query(Product.category).filter(Product.id == behavior.product_id).first()
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        
+        db_behavior = UserBehavior(
+            id=str(uuid.uuid4()),
+            user_id=behavior.user_id,
+            product_id=behavior.product_id,
+            category=product.category,
+            action=behavior.action,
+            timestamp=datetime.utcnow()
+        )
+        db.add(db_behavior)
+        db.commit()
+        db.refresh(db_behavior)
+        # The cached profile and the recommendations built on it are stale now
+        get_profile_cache().delete(behavior.user_id)
+        get_recommendation_cache().invalidate_user(behavior.user_id)
+        return db_behavior
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    readiness = get_readiness()
+    # Still serving, but startup hit an error (and may be retrying it)
+    if readiness.error is not None:
+        return {"status": "degraded", "phase": readiness.phase, "error": readiness.error}
+    return {"status": "healthy", "phase": readiness.phase}
+
+@app.get("/ready")
+async def readiness_check():
+    """200 once vector search is available, 503 while starting up or degraded"""
+    readiness = get_readiness()
+    return JSONResponse(
+        status_code=200 if readiness.vector_ready else 503,
+        content=readiness.stats()
+    )
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Stage latency histograms and per-stage counters in the Prometheus text format"""
+    return PlainTextResponse(
+        get_telemetry().render({"deadline_misses_total": get_deadline_stats().stats()["misses"]}),
+        media_type="text/plain; version=0.0.4"
+    )
+
+@app.get("/debug/stats")
+async def get_stats():
+    # Opening Chroma here would block the event loop until startup indexing is done
+    vector_store = get_vector_store() if get_readiness().vector_ready else opened_vector_store()
+    return {
+        "recommendation_cache": get_recommendation_cache().stats(),
+        "profile_cache": get_profile_cache().stats(),
+        "embedding_cache": get_embedding_cache().stats(),
+        "llm_response_cache": get_llm_response_cache().stats(),
+        "llm_client": get_llm_client().stats(),
+        "vector_store": vector_store.stats() if vector_store is not None else "loading",
+        "category_index": get_category_index().stats(),
+        "vector_sync": get_vector_sync().stats(),
+        "readiness": get_readiness().stats(),
+        "deadlines": get_deadline_stats().stats(),
+        "db_pool": get_pool_stats()
+    }
+
+@app.post("/debug/vector-sync")
+async def sync_vector_store():
+    """Sync product changes to the vector store now instead of waiting for the schedule"""
+    try:
+        return await asyncio.get_running_loop().run_in_executor(None, get_vector_sync().run)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/debug/users", response_model=List[UserBase])
-async def get_users(db: Session = Depends(get_db)):
+async def get_users(adb: Optional[AsyncSession] = Depends(get_async_db)):
     try:
-        users = db.query(User).limit(5).all()
-        return users
+        stmt = select(User).limit(5)
+        if adb is not None:
+            return (await adb.execute(stmt)).scalars().all()
+        return await run_in_session(lambda db: db.execute(stmt).scalars().all())
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/debug/products", response_model=List[ProductBase])
-async def get_products(db: Session = Depends(get_db)):
+async def get_products(adb: Optional[AsyncSession] = Depends(get_async_db)):
     try:
-        products = db.query(Product).limit(5).all()
-        return products
+        stmt = select(Product).limit(5)
+        if adb is not None:
+            return (await adb.execute(stmt)).scalars().all()
+        return await run_in_session(lambda db: db.execute(stmt).scalars().all())
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -154,36 +392,29 @@ async def generate_test_data(db: Session = Depends(get_db)):
     try:
         # First, clear existing data
         db.query(RecommendationFeedback).delete()
+        FeedbackAnalyzer(db).clear_aggregates()
         db.query(UserBehavior).delete()
         db.query(Product).delete()
         db.query(User).delete()
         db.commit()
 
         # Create new data
-        from app.utils.data_generator import DataGenerator
         generator = DataGenerator()
         data = generator.generate_bulk_data(
             num_users=100,
             num_products=1000,
             num_behaviors=5000
         )
+        await asyncio.get_running_loop().run_in_executor(
+            db_executor, BulkLoader().load_generated, data
+        )
         
-        # Add users
-        for user_data in data["users"]:
-            user = User(**user_data)
-            db.add(user)
-        
-        # Add products
-        for product_data in data["products"]:
-            product = Product(**product_data)
-            db.add(product)
-        
-        # Add behaviors
-        for behavior_data in data["user_behaviors"]:
-            behavior = UserBehavior(**behavior_data)
-            db.add(behavior)
-        
-        db.commit()
+        # Every cached profile and recommendation refers to the old data
+        get_profile_cache().clear()
+        get_recommendation_cache().clear()
+        # Startup builds the index itself once the vector store has loaded
+        if get_readiness().vector_ready:
+            await asyncio.get_running_loop().run_in_executor(None, refresh_category_index)
 
         # Return the ID of the first user created
         first_user = db.query(User).first()
@@ -223,12 +454,13 @@ async def get_smart_recommendations(
     user_id: str,
     query: str = None,
     limit: int = 5,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    deadline: Deadline = Depends(get_deadline)
 ):
     """Get enhanced recommendations using the multi-agent system"""
     try:
         coordinator = AgentCoordinator(db)
-        result = await coordinator.get_smart_recommendations(user_id, query, limit)
+        result = await coordinator.get_smart_recommendations(user_id, query, limit, deadline)
         
         if result["status"] == "error":
             raise HTTPException(status_code=404, detail=result["message"])
@@ -236,18 +468,35 @@ async def get_smart_recommendations(
         return result
     except HTTPException as e:
         raise e
+    except TaskGraphError as e:
+        raise graph_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/v2/recommendations/{user_id}/stream")
+async def stream_smart_recommendations(
+    user_id: str,
+    query: str = None,
+    limit: int = 5,
+    db: Session = Depends(get_db),
+    deadline: Deadline = Depends(get_deadline)
+):
+    """Stream enhanced recommendations as server-sent events"""
+    coordinator = AgentCoordinator(db)
+    return await sse_response(
+        coordinator.stream_smart_recommendations(user_id, query, limit, deadline)
+    )
+
 @app.get("/api/v2/products/{product_id}/insights")
 async def analyze_product_feedback(
     product_id: str,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    deadline: Deadline = Depends(get_deadline)
 ):
     """Get product feedback analysis using the multi-agent system"""
     try:
         coordinator = AgentCoordinator(db)
-        result = await coordinator.analyze_product_feedback(product_id)
+        result = await coordinator.analyze_product_feedback(product_id, deadline)
         
         if result["status"] == "error":
             raise HTTPException(status_code=404, detail=result["message"])
@@ -255,6 +504,8 @@ async def analyze_product_feedback(
         return result
     except HTTPException as e:
         raise e
+    except TaskGraphError as e:
+        raise graph_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -267,12 +518,13 @@ async def semantic_search(
 ):
     """Search products using semantic search"""
     try:
-        from app.agents.vector_agent import VectorAgent
-        
         if not query:
             raise HTTPException(status_code=400, detail="Search query is required")
+        
+        if not get_readiness().vector_ready:
+            raise HTTPException(status_code=503, detail="Vector index is still loading")
             
-        vector_agent = VectorAgent()
+        vector_agent = get_agent_registry().vector_agent
         result = await vector_agent.search_similar_products(query, limit)
         
         if "error" in result:
@@ -282,4 +534,23 @@ async def semantic_search(
     except HTTPException as e:
         raise e
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/v2/search/batch")
+async def semantic_search_batch(request: SemanticSearchBatchRequest):
+    """Search products for many queries with one batched vector store call"""
+    try:
+        if not get_readiness().vector_ready:
+            raise HTTPException(status_code=503, detail="Vector index is still loading")
+        
+        vector_agent = get_agent_registry().vector_agent
+        result = await vector_agent.search_many(request.queries, request.limit, where=request.where)
+        
+        if "error" in result:
+            raise HTTPException(status_code=500, detail=result["error"])
+            
+        return result
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, Integer, DateTime, ForeignKey
+from sqlalchemy import Column, String, Float, Integer, DateTime, ForeignKey, Index
 from datetime import datetime
 from .database import Base
 
@@ -14,6 +14,8 @@ class Product(Base):
     rating = Column(Float)
     stock = Column(Integer, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Change tracking for the incremental vector store sync
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
 class User(Base):
     __tablename__ = "users"
@@ -34,6 +36,11 @@ class UserBehavior(Base):
     action = Column(String, nullable=False)
     timestamp = Column(DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        # Covers the profile query: WHERE user_id [AND timestamp >= ?] GROUP BY category, action
+        Index("ix_user_behaviors_user_category_action_ts", "user_id", "category", "action", "timestamp"),
+    )
+    
     def __repr__(self):
         return f"<UserBehavior(id={self.id}, user_id={self.user_id}, action={self.action})>"
 
@@ -47,5 +54,43 @@ class RecommendationFeedback(Base):
     feedback = Column(String, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        # Covers low-rated lookups: WHERE user_id = ? AND rating <= ? -> product_id
+        Index("ix_recommendation_feedbacks_user_rating_product", "user_id", "rating", "product_id"),
+        # Covers per-product AVG/COUNT of rating
+        Index("ix_recommendation_feedbacks_product_rating", "product_id", "rating"),
+    )
+    
     def __repr__(self):
         return f"<RecommendationFeedback(id={self.id}, user_id={self.user_id}, rating={self.rating})>"
+
+class FeedbackRatingCount(Base):
+    """Materialized histogram of feedback ratings, maintained by FeedbackAnalyzer"""
+    __tablename__ = "feedback_rating_counts"
+    
+    rating = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+class ProductFeedbackAggregate(Base):
+    """Materialized per-product feedback sum/count, maintained by FeedbackAnalyzer"""
+    __tablename__ = "product_feedback_aggregates"
+    
+    product_id = Column(String, primary_key=True)
+    rating_sum = Column(Integer, nullable=False, default=0)
+    rating_count = Column(Integer, nullable=False, default=0)
+
+class UserFeedbackAggregate(Base):
+    """Materialized per-user feedback sum/count, maintained by FeedbackAnalyzer"""
+    __tablename__ = "user_feedback_aggregates"
+    
+    user_id = Column(String, primary_key=True)
+    rating_sum = Column(Integer, nullable=False, default=0)
+    rating_count = Column(Integer, nullable=False, default=0)
+
+class SyncState(Base):
+    """Progress markers of resumable background jobs, stored as JSON"""
+    __tablename__ = "sync_state"
+    
+    name = Column(String, primary_key=True)
+    value = Column(String, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -1,5 +1,6 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from datetime import datetime
+from typing import Any, Dict, List, Optional
 
 class UserBase(BaseModel):
     id: str
@@ -28,12 +29,18 @@ class UserBehaviorBase(BaseModel):
     id: str
     user_id: str
     product_id: str
+    category: str
     action: str
     timestamp: datetime
 
     class Config:
         from_attributes = True
 
+class UserBehaviorCreate(BaseModel):
+    user_id: str = Field(..., example="user123")
+    product_id: str = Field(..., example="product456")
+    action: str = Field(..., example="purchase")
+
 class RecommendationFeedbackCreate(BaseModel):
     user_id: str = Field(..., example="user123")
     product_id: str = Field(..., example="product456")
@@ -46,3 +53,49 @@ class RecommendationFeedbackRead(RecommendationFeedbackCreate):
 
     class Config:
         from_attributes = True
+
+class SemanticSearchBatchRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, example=["best products in Electronics", "summer clothes"])
+    limit: int = Field(5, ge=1, le=50, example=5)
+    where: Optional[Dict[str, Any]] = Field(None, example={"category": "Electronics"})
+
+    @field_validator("where")
+    @classmethod
+    def check_where(cls, where: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if where is not None:
+            _check_where(where)
+        return where
+
+
+_COMPARISON_OPERATORS = {"$eq", "$ne", "$gt", "$gte", "$lt", "$lte"}
+_LIST_OPERATORS = {"$in", "$nin"}
+_LOGICAL_OPERATORS = {"$and", "$or"}
+_SCALAR_TYPES = (str, int, float, bool)
+
+
+def _check_where(where: Any) -> None:
+    """Raise ValueError unless where has the shape of a Chroma metadata filter"""
+    if not isinstance(where, dict) or len(where) != 1:
+        raise ValueError("where must be an object with exactly one field or operator")
+    key, value = next(iter(where.items()))
+    if key in _LOGICAL_OPERATORS:
+        if not isinstance(value, list) or len(value) < 2:
+            raise ValueError(f"{key} takes a list of at least two filters")
+        for clause in value:
+            _check_where(clause)
+    elif key.startswith("$"):
+        raise ValueError(f"Unsupported operator: {key}")
+    elif isinstance(value, dict):
+        if len(value) != 1:
+            raise ValueError(f"Filter on {key} must have exactly one operator")
+        operator, operand = next(iter(value.items()))
+        if operator in _COMPARISON_OPERATORS:
+            if not isinstance(operand, _SCALAR_TYPES):
+                raise ValueError(f"{operator} on {key} takes a string, number or boolean")
+        elif operator in _LIST_OPERATORS:
+            if not isinstance(operand, list) or not operand or not all(isinstance(v, _SCALAR_TYPES) for v in operand):
+                raise ValueError(f"{operator} on {key} takes a non-empty list of strings, numbers or booleans")
+        else:
+            raise ValueError(f"Unsupported operator on {key}: {operator}")
+    elif not isinstance(value, _SCALAR_TYPES):
+        raise ValueError(f"Filter on {key} must be a string, number, boolean or operator object")
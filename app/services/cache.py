@@ -0,0 +1,289 @@
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Dict, Hashable, List, Optional
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe LRU cache with optional TTL expiry and hit/miss counters"""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, or default if missing or expired"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value, evicting the least recently used entries when full"""
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop every entry whose key matches the predicate"""
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                del self._data[key]
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+class RecommendationCache(LRUCache):
+    """Recommendation results keyed by (user_id, query)"""
+
+    def key(self, user_id: str, query: Optional[str] = None) -> tuple:
+        return (user_id, query or "default")
+
+    def invalidate_user(self, user_id: str) -> int:
+        """Drop all cached recommendations of a user"""
+        return self.invalidate(lambda key: key[0] == user_id)
+
+
+class EmbeddingCache(LRUCache):
+    """Query text -> embedding vector, optionally persisted to a JSON file"""
+
+    def __init__(self, maxsize: int = 4096, path: Optional[str] = None):
+        super().__init__(maxsize=maxsize)
+        self.path = path
+
+    def load(self) -> int:
+        """Load persisted embeddings, returns the number of entries read"""
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load embedding cache from {self.path}: {e}")
+            return 0
+        for text, vector in entries[-self.maxsize:]:
+            self.set(text, vector)
+        return len(entries)
+
+    def save(self) -> None:
+        """Persist the cached embeddings, least recently used first"""
+        if not self.path:
+            return
+        with self._lock:
+            entries: List = [[text, value] for text, (value, _) in self._data.items()]
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self.path)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "path": self.path}
+
+
+class SQLiteCache:
+    """Disk-backed cache with the same get/set/stats interface as LRUCache.
+
+    Values must be JSON serializable. Entries expire after ttl seconds and the
+    oldest entries are dropped once maxsize is exceeded.
+    """
+
+    def __init__(self, path: str, maxsize: int = 10000, ttl: Optional[float] = None):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " expires_at REAL, stored_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_stored_at ON cache (stored_at)")
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (row[1] is not None and row[1] <= time.time()):
+                self.misses += 1
+                return default
+            self.hits += 1
+            return json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, stored_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + ttl if ttl else None, now)
+            )
+            # Drop expired entries first, then the oldest ones over the size bound
+            self._conn.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+            overflow = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0] - self.maxsize
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY stored_at LIMIT ?)",
+                    (overflow,)
+                )
+                self.evictions += overflow
+            self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "size": len(self),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+def _normalize(value: Any) -> Any:
+    """Make a value JSON-stable: sorted sets, string keys, nested dicts/lists"""
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    if isinstance(value, (set, frozenset)):
+        return sorted(_normalize(v) for v in value)
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def stable_hash(*parts: Any) -> str:
+    """Stable SHA-256 over normalized inputs, independent of dict/set ordering"""
+    payload = json.dumps(_normalize(list(parts)), sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+@lru_cache()
+def get_recommendation_cache() -> RecommendationCache:
+    """Application-scoped recommendation cache shared by every request"""
+    settings = get_settings()
+    return RecommendationCache(
+        maxsize=settings.RECOMMENDATION_CACHE_SIZE,
+        ttl=settings.RECOMMENDATION_CACHE_TTL_SECONDS
+    )
+
+
+@lru_cache()
+def get_profile_cache() -> LRUCache:
+    """Application-scoped user profile cache keyed by user_id"""
+    settings = get_settings()
+    return LRUCache(
+        maxsize=settings.PROFILE_CACHE_SIZE,
+        ttl=settings.PROFILE_CACHE_TTL_SECONDS
+    )
+
+
+@lru_cache()
+def get_embedding_cache() -> EmbeddingCache:
+    """Application-scoped query embedding cache, loaded from disk if configured"""
+    settings = get_settings()
+    cache = EmbeddingCache(
+        maxsize=settings.EMBEDDING_CACHE_SIZE,
+        path=settings.EMBEDDING_CACHE_PATH
+    )
+    cache.load()
+    return cache
+
+
+@lru_cache()
+def get_llm_response_cache():
+    """Application-scoped cache of generated LLM text"""
+    settings = get_settings()
+    if settings.LLM_CACHE_BACKEND == "sqlite":
+        return SQLiteCache(
+            path=settings.LLM_CACHE_PATH,
+            maxsize=settings.LLM_CACHE_SIZE,
+            ttl=settings.LLM_CACHE_TTL_SECONDS
+        )
+    return LRUCache(
+        maxsize=settings.LLM_CACHE_SIZE,
+        ttl=settings.LLM_CACHE_TTL_SECONDS
+    )
@@ -0,0 +1,194 @@
+from sqlalchemy import case, or_, select
+from sqlalchemy.orm import Session
+from app.models import Product
+from app.database import SessionLocal
+from app.services.vector_store import get_vector_store
+from app.services.feedback_analyzer import FeedbackAnalyzer
+from app.config import get_settings
+from functools import lru_cache
+from typing import Dict, List, Optional
+from datetime import datetime
+import asyncio
+import copy
+import logging
+import math
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Weights of the candidate score components
+RATING_WEIGHT = 0.35
+FEEDBACK_WEIGHT = 0.25
+STOCK_WEIGHT = 0.1
+SIMILARITY_WEIGHT = 0.3
+
+
+class CategoryIndex:
+    """Precomputed, periodically refreshed top-N candidate lists per category.
+
+    Serves query-less recommendations without embedding a query or running
+    an ANN search. Candidates are ranked by product rating, stock, feedback
+    average and similarity to the "best products in {category}" query.
+    """
+
+    def __init__(self, top_n: int = 50, pool_factor: int = 4):
+        self.top_n = top_n
+        self.pool_factor = pool_factor
+        self._candidates: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self.built_at: Optional[datetime] = None
+        self.build_seconds: Optional[float] = None
+
+    def build(self, db: Session, vector_store=None) -> None:
+        """Rebuild the candidate lists from the products table"""
+        start = time.perf_counter()
+        categories = [c for (c,) in db.query(Product.category).distinct().all()]
+        pool_size = self.top_n * self.pool_factor
+
+        # Best rated products first, in-stock before out-of-stock
+        pools = {}
+        for category in categories:
+            pools[category] = db.execute(sql_candidates_stmt(category, n_results=pool_size)).scalars().all()
+
+        product_ids = [p.id for pool in pools.values() for p in pool]
+        feedback = FeedbackAnalyzer(db).get_products_feedback_stats(product_ids)
+        similarities = self._similarities(vector_store, pools)
+
+        candidates = {}
+        for category, pool in pools.items():
+            scored = []
+            for product in pool:
+                similarity = similarities.get(product.id, 0.0)
+                avg_rating = feedback[product.id]["average_rating"]
+                count = feedback[product.id]["total_feedbacks"]
+                score = (
+                    RATING_WEIGHT * (product.rating or 0) / 5
+                    + FEEDBACK_WEIGHT * (avg_rating / 5 if count else (product.rating or 0) / 5)
+                    + STOCK_WEIGHT * (1 if (product.stock or 0) > 0 else 0)
+                    + SIMILARITY_WEIGHT * similarity
+                )
+                scored.append((score, similarity, product))
+            scored.sort(key=lambda item: item[0], reverse=True)
+
+            top = scored[:self.top_n]
+            candidates[category] = candidates_from_products(
+                [p for _, _, p in top],
+                # Squared L2 distance between unit vectors, as Chroma reports it
+                distances=[2 * (1 - similarity) for _, similarity, _ in top]
+            )
+
+        with self._lock:
+            self._candidates = candidates
+            self.built_at = datetime.utcnow()
+            self.build_seconds = time.perf_counter() - start
+        logger.info(f"Category index built: {len(candidates)} categories in {self.build_seconds:.2f}s")
+
+    def _similarities(self, vector_store, pools: Dict[str, List[Product]]) -> Dict[str, float]:
+        """Cosine similarity of each pooled product to its category query"""
+        if vector_store is None or not pools:
+            return {}
+        try:
+            categories = list(pools)
+            query_vectors = vector_store.embed_queries(
+                [f"best products in {category}" for category in categories]
+            )
+            similarities = {}
+            for category, query_vector in zip(categories, query_vectors):
+                ids = [p.id for p in pools[category]]
+                if not ids:
+                    continue
+                for product_id, vector in vector_store.get_embeddings(ids).items():
+                    similarities[product_id] = _cosine(query_vector, vector)
+            return similarities
+        except Exception as e:
+            logger.warning(f"Category index built without vector similarity: {e}")
+            return {}
+
+    def get(self, category: str, n_results: int = 10) -> Optional[Dict]:
+        """Return the top candidates of a category, or None if not indexed"""
+        with self._lock:
+            candidates = self._candidates.get(category)
+        if candidates is None:
+            return None
+        # Callers annotate the metadatas, so hand out copies
+        return {key: copy.deepcopy(values[:n_results]) for key, values in candidates.items()}
+
+    def stats(self) -> Dict:
+        return {
+            "categories": len(self._candidates),
+            "top_n": self.top_n,
+            "built_at": self.built_at.isoformat() if self.built_at else None,
+            "build_seconds": round(self.build_seconds, 4) if self.build_seconds is not None else None
+        }
+
+
+def candidates_from_products(products: List[Product], distances: Optional[List[float]] = None) -> Dict:
+    """Shape products like a vector store search result"""
+    return {
+        "ids": [p.id for p in products],
+        "documents": [f"{p.name} {p.category} {p.description}" for p in products],
+        "metadatas": [
+            {
+                "category": p.category,
+                "brand": p.brand,
+                "price": float(p.price),
+                "rating": float(p.rating or 0)
+            }
+            for p in products
+        ],
+        "distances": distances
+    }
+
+
+def sql_candidates_stmt(category: Optional[str] = None, query: Optional[str] = None, n_results: int = 10):
+    """Best rated in-stock products matching a category and/or query words.
+
+    Serves recommendations without the vector store, e.g. while it loads.
+    """
+    stmt = select(Product)
+    if category:
+        stmt = stmt.where(Product.category == category)
+    words = [word for word in (query or "").split() if len(word) > 2][:5]
+    if words:
+        stmt = stmt.where(or_(*(
+            column.ilike(f"%{word}%")
+            for word in words
+            for column in (Product.name, Product.category, Product.description)
+        )))
+    return stmt.order_by(
+        case((Product.stock > 0, 0), else_=1),
+        Product.rating.desc()
+    ).limit(n_results)
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+@lru_cache()
+def get_category_index() -> CategoryIndex:
+    """Application-scoped category candidate index"""
+    return CategoryIndex(top_n=get_settings().CATEGORY_INDEX_TOP_N)
+
+
+def refresh_category_index() -> None:
+    """Rebuild the shared category index with its own session"""
+    db = SessionLocal()
+    try:
+        get_category_index().build(db, get_vector_store())
+    finally:
+        db.close()
+
+
+async def run_category_index_refresh(interval: float) -> None:
+    """Refresh the category index every interval seconds"""
+    loop = asyncio.get_event_loop()
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await loop.run_in_executor(None, refresh_category_index)
+        except Exception as e:
+            logger.error(f"Error refreshing category index: {str(e)}")
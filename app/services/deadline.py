@@ -0,0 +1,70 @@
+from functools import lru_cache
+from typing import Dict, List, Optional
+import threading
+import time
+
+
+class DeadlineStats:
+    """Application-wide count of stages skipped or cut short by a deadline"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.misses: Dict[str, int] = {}
+
+    def record(self, stage: str) -> None:
+        with self._lock:
+            self.misses[stage] = self.misses.get(stage, 0) + 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"misses": dict(self.misses)}
+
+
+@lru_cache()
+def get_deadline_stats() -> DeadlineStats:
+    """Application-scoped deadline miss counters"""
+    return DeadlineStats()
+
+
+class Deadline:
+    """The point in time by which a request must be answered.
+
+    Stages ask `allows` before starting work that needs a minimum amount of
+    time, and skip or degrade that work when the budget is too small.
+    """
+
+    def __init__(self, budget_ms: float):
+        self.budget_ms = budget_ms
+        # time.monotonic() value, comparable with the LLM client's deadlines
+        self.at = time.monotonic() + budget_ms / 1000
+        self.missed: List[str] = []
+
+    def remaining(self) -> float:
+        """Seconds left, never negative"""
+        return max(self.at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.at
+
+    def allows(self, stage: str, min_seconds: float) -> bool:
+        """True when at least min_seconds remain; otherwise counts a miss for stage"""
+        if self.remaining() >= min_seconds:
+            return True
+        self.miss(stage)
+        return False
+
+    def miss(self, stage: str) -> None:
+        self.missed.append(stage)
+        get_deadline_stats().record(stage)
+
+    def stats(self) -> Dict:
+        return {
+            "budget_ms": self.budget_ms,
+            "remaining_ms": round(self.remaining() * 1000, 1),
+            "missed": list(self.missed)
+        }
+
+
+def deadline_at(deadline: Optional[Deadline]) -> Optional[float]:
+    return deadline.at if deadline is not None else None
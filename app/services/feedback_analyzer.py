@@ -1,64 +1,232 @@
-from sqlalchemy import func
+from sqlalchemy import func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.models import RecommendationFeedback
-from typing import Dict, Set
+from app.models import (
+    RecommendationFeedback,
+    FeedbackRatingCount,
+    ProductFeedbackAggregate,
+    UserFeedbackAggregate
+)
+from typing import Dict, Iterable, List, Optional, Set
+from datetime import datetime
+import logging
 import re
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Dialects whose INSERT supports ON CONFLICT DO UPDATE
+_UPSERT_INSERTS = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert
+}
 
 class FeedbackAnalyzer:
     def __init__(self, db: Session):
         self.db = db
-    
+
     def extract_rating(self, feedback: str) -> int:
         """Extracts the rating value from the feedback text"""
         match = re.search(r'Rating: (\d+)/5', feedback)
         if match:
             return int(match.group(1))
         return 0
-    
+
+    def record_feedback(self, user_id: str, product_id: str, rating: int, feedback: str) -> RecommendationFeedback:
+        """Adds a feedback row and updates the aggregates in the same transaction.
+
+        The caller commits (or rolls back) the session.
+        """
+        db_feedback = RecommendationFeedback(
+            id=str(uuid.uuid4()),
+            user_id=user_id,
+            product_id=product_id,
+            rating=rating,
+            feedback=feedback,
+            created_at=datetime.utcnow()
+        )
+        self.db.add(db_feedback)
+
+        self._increment(FeedbackRatingCount, FeedbackRatingCount.rating, rating, count=1)
+        self._increment(ProductFeedbackAggregate, ProductFeedbackAggregate.product_id, product_id,
+                        rating_sum=rating, rating_count=1)
+        self._increment(UserFeedbackAggregate, UserFeedbackAggregate.user_id, user_id,
+                        rating_sum=rating, rating_count=1)
+        return db_feedback
+
+    def _increment(self, model, key_column, key, **deltas) -> None:
+        """Adds deltas to an aggregate row, creating it on first use.
+
+        A single INSERT ... ON CONFLICT DO UPDATE, so concurrent first
+        feedbacks for the same key both land instead of one failing on the
+        primary key.
+        """
+        dialect_insert = _UPSERT_INSERTS.get(self.db.get_bind().dialect.name)
+        if dialect_insert is None:
+            # No native upsert: update, and insert when there was no row yet
+            updated = self.db.query(model).filter(key_column == key).update(
+                {getattr(model, column): getattr(model, column) + delta for column, delta in deltas.items()},
+                synchronize_session=False
+            )
+            if not updated:
+                self.db.add(model(**{key_column.key: key}, **deltas))
+                self.db.flush()
+            return
+
+        stmt = dialect_insert(model).values({key_column.key: key, **deltas})
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[key_column],
+            set_={column: getattr(model, column) + getattr(stmt.excluded, column) for column in deltas}
+        )
+        self.db.execute(stmt)
+
+    def rebuild_aggregates(self) -> Dict:
+        """Recomputes every feedback aggregate from the feedback table"""
+        self.db.query(FeedbackRatingCount).delete()
+        self.db.query(ProductFeedbackAggregate).delete()
+        self.db.query(UserFeedbackAggregate).delete()
+
+        self.db.execute(insert(FeedbackRatingCount).from_select(
+            ["rating", "count"],
+            self.db.query(
+                RecommendationFeedback.rating,
+                func.count()
+            ).group_by(RecommendationFeedback.rating)
+        ))
+        self.db.execute(insert(ProductFeedbackAggregate).from_select(
+            ["product_id", "rating_sum", "rating_count"],
+            self.db.query(
+                RecommendationFeedback.product_id,
+                func.sum(RecommendationFeedback.rating),
+                func.count()
+            ).group_by(RecommendationFeedback.product_id)
+        ))
+        self.db.execute(insert(UserFeedbackAggregate).from_select(
+            ["user_id", "rating_sum", "rating_count"],
+            self.db.query(
+                RecommendationFeedback.user_id,
+                func.sum(RecommendationFeedback.rating),
+                func.count()
+            ).group_by(RecommendationFeedback.user_id)
+        ))
+        self.db.commit()
+
+        stats = self.get_global_feedback_stats()
+        logger.info(f"Rebuilt feedback aggregates: {stats['total_feedbacks']} feedbacks")
+        return stats
+
+    def aggregates_out_of_date(self) -> bool:
+        """True when the aggregates do not account for every feedback row"""
+        feedback_count = self.db.query(func.count()).select_from(RecommendationFeedback).scalar()
+        return feedback_count != self.get_global_feedback_stats()["total_feedbacks"]
+
+    def clear_aggregates(self) -> None:
+        """Drops all aggregates; use together with deleting the feedback rows"""
+        self.db.query(FeedbackRatingCount).delete()
+        self.db.query(ProductFeedbackAggregate).delete()
+        self.db.query(UserFeedbackAggregate).delete()
+
     def get_user_feedback_stats(self, user_id: str) -> Dict:
         """Analyzes user feedback statistics"""
-        feedbacks = self.db.query(RecommendationFeedback).filter(
-            RecommendationFeedback.user_id == user_id
-        ).all()
-        
-        return {
-            "average_rating": sum(f.rating for f in feedbacks) / len(feedbacks) if feedbacks else 0,
-            "feedback_count": len(feedbacks),
-            "low_rated_products": self.get_low_rated_products(user_id)
-        }
-    
+        aggregate = self.db.execute(_user_aggregate_stmt(user_id)).scalars().first()
+        return _user_feedback_stats(aggregate, self.get_low_rated_products(user_id))
+
     def get_low_rated_products(self, user_id: str, threshold: int = 3) -> Set[str]:
         """Returns products that the user rated low"""
-        low_rated = self.db.query(RecommendationFeedback.product_id).filter(
-            RecommendationFeedback.user_id == user_id,
-            RecommendationFeedback.rating <= threshold
-        ).all()
-        return {product_id for (product_id,) in low_rated}
-    
+        return set(self.db.execute(_low_rated_stmt(user_id, threshold)).scalars().all())
+
     def get_product_feedback_stats(self, product_id: str) -> Dict:
         """Returns feedback statistics for the product"""
-        stats = self.db.query(
-            func.avg(RecommendationFeedback.rating).label('avg_rating'),
-            func.count(RecommendationFeedback.id).label('total_feedbacks')
-        ).filter(
-            RecommendationFeedback.product_id == product_id
-        ).first()
-        
-        return {
-            "average_rating": float(stats.avg_rating) if stats.avg_rating else 0,
-            "total_feedbacks": stats.total_feedbacks
-        }
+        return self.get_products_feedback_stats([product_id])[product_id]
+
+    def get_products_feedback_stats(self, product_ids: Iterable[str]) -> Dict[str, Dict]:
+        """Returns feedback statistics for many products from their aggregate rows"""
+        product_ids = list(dict.fromkeys(product_ids))
+        if not product_ids:
+            return {}
+        rows = self.db.execute(_products_aggregate_stmt(product_ids)).scalars().all()
+        return _products_feedback_stats(product_ids, rows)
 
     def get_global_feedback_stats(self) -> Dict:
         """Analyzes overall statistics of all feedback"""
-        ratings = self.db.query(RecommendationFeedback.rating).all()
-        ratings_distribution = {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
-        
-        for (rating,) in ratings:
-            if rating in ratings_distribution:
-                ratings_distribution[rating] += 1
-        
-        return {
-            "ratings_distribution": ratings_distribution,
-            "total_feedbacks": len(ratings)
+        rows = self.db.execute(_rating_counts_stmt()).scalars().all()
+        return _global_feedback_stats(rows)
+
+
+class AsyncFeedbackAnalyzer:
+    """Read-only FeedbackAnalyzer queries on an AsyncSession"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_user_feedback_stats(self, user_id: str) -> Dict:
+        aggregate = (await self.db.execute(_user_aggregate_stmt(user_id))).scalars().first()
+        return _user_feedback_stats(aggregate, await self.get_low_rated_products(user_id))
+
+    async def get_low_rated_products(self, user_id: str, threshold: int = 3) -> Set[str]:
+        return set((await self.db.execute(_low_rated_stmt(user_id, threshold))).scalars().all())
+
+    async def get_product_feedback_stats(self, product_id: str) -> Dict:
+        return (await self.get_products_feedback_stats([product_id]))[product_id]
+
+    async def get_products_feedback_stats(self, product_ids: Iterable[str]) -> Dict[str, Dict]:
+        product_ids = list(dict.fromkeys(product_ids))
+        if not product_ids:
+            return {}
+        rows = (await self.db.execute(_products_aggregate_stmt(product_ids))).scalars().all()
+        return _products_feedback_stats(product_ids, rows)
+
+    async def get_global_feedback_stats(self) -> Dict:
+        rows = (await self.db.execute(_rating_counts_stmt())).scalars().all()
+        return _global_feedback_stats(rows)
+
+
+# Statements and result shaping shared by the sync and async analyzers
+
+def _user_aggregate_stmt(user_id: str):
+    return select(UserFeedbackAggregate).where(UserFeedbackAggregate.user_id == user_id)
+
+def _low_rated_stmt(user_id: str, threshold: int):
+    return select(RecommendationFeedback.product_id).where(
+        RecommendationFeedback.user_id == user_id,
+        RecommendationFeedback.rating <= threshold
+    )
+
+def _products_aggregate_stmt(product_ids: List[str]):
+    return select(ProductFeedbackAggregate).where(
+        ProductFeedbackAggregate.product_id.in_(product_ids)
+    )
+
+def _rating_counts_stmt():
+    return select(FeedbackRatingCount)
+
+def _user_feedback_stats(aggregate: Optional[UserFeedbackAggregate], low_rated_products: Set[str]) -> Dict:
+    count = aggregate.rating_count if aggregate else 0
+    return {
+        "average_rating": aggregate.rating_sum / count if count else 0,
+        "feedback_count": count,
+        "low_rated_products": low_rated_products
+    }
+
+def _products_feedback_stats(product_ids: List[str], rows: List[ProductFeedbackAggregate]) -> Dict[str, Dict]:
+    stats = {
+        product_id: {"average_rating": 0, "total_feedbacks": 0}
+        for product_id in product_ids
+    }
+    for row in rows:
+        stats[row.product_id] = {
+            "average_rating": row.rating_sum / row.rating_count if row.rating_count else 0,
+            "total_feedbacks": row.rating_count
         }
+    return stats
+
+def _global_feedback_stats(rows: List[FeedbackRatingCount]) -> Dict:
+    ratings_distribution = {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
+    for row in rows:
+        if row.rating in ratings_distribution:
+            ratings_distribution[row.rating] += row.count
+    return {
+        "ratings_distribution": ratings_distribution,
+        "total_feedbacks": sum(ratings_distribution.values())
+    }
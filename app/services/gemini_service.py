@@ -1,22 +1,24 @@
-import google.generativeai as genai
 from app.config import get_settings
-import asyncio
-from typing import Dict, List
+from app.services.cache import get_llm_response_cache, stable_hash
+from app.services.llm_client import get_llm_client
+from app.services.telemetry import span, timed
+from typing import AsyncIterator, Dict, List, Optional
 
 settings = get_settings()
 
 class GeminiService:
     def __init__(self):
-        genai.configure(api_key=settings.GEMINI_API_KEY)
-        self.model = genai.GenerativeModel(settings.MODEL_NAME)
+        self.client = get_llm_client()
+        self.model = self.client.model
+        self.cache = get_llm_response_cache()
     
-    async def generate_recommendation(
-        self, 
-        user_profile: Dict, 
-        products: List,
-        feedback_stats: Dict
-    ) -> str:
-        prompt = f"""
+    def _recommendation_cache_key(self, user_profile: Dict, products: List, feedback_stats: Dict) -> str:
+        # Identical profile, candidates and feedback produce the same text
+        product_ids = products.get("ids", []) if isinstance(products, dict) else products
+        return stable_hash("recommendation", settings.MODEL_NAME, user_profile, product_ids, feedback_stats)
+
+    def _build_recommendation_prompt(self, user_profile: Dict, products: List, feedback_stats: Dict) -> str:
+        return f"""
         Based on the user profile, available products, and feedback statistics, 
         generate personalized product recommendations.
         
@@ -52,13 +54,61 @@ class GeminiService:
         • [2-3 bullet points about why these recommendations match the user profile]
         • [Include insights from feedback statistics]
         """
-        
 
-        loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(
-            None, 
-            lambda: self.model.generate_content(prompt)
-        )
+    @timed("gemini.generate_recommendation")
+    async def generate_recommendation(
+        self, 
+        user_profile: Dict, 
+        products: List,
+        feedback_stats: Dict,
+        deadline: Optional[float] = None
+    ) -> str:
+        cache_key = self._recommendation_cache_key(user_profile, products, feedback_stats)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        prompt = self._build_recommendation_prompt(user_profile, products, feedback_stats)
         
+        text = await self._generate(prompt, deadline)
+        self.cache.set(cache_key, text)
+        return text
+
+    async def stream_recommendation(
+        self, 
+        user_profile: Dict, 
+        products: List,
+        feedback_stats: Dict,
+        deadline: Optional[float] = None
+    ) -> AsyncIterator[str]:
+        """Yield recommendation text chunks as Gemini produces them"""
+        cache_key = self._recommendation_cache_key(user_profile, products, feedback_stats)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+        prompt = self._build_recommendation_prompt(user_profile, products, feedback_stats)
+        chunks = []
+        # Not the current span: the stream is resumed wherever the consumer runs
+        with span("gemini.stream_recommendation", current=False):
+            async for text in self.client.stream(prompt, deadline=deadline):
+                chunks.append(text)
+                yield text
+        self.cache.set(cache_key, "".join(chunks))
+
+    @timed("gemini.generate_content")
+    async def generate_content(self, prompt: str, deadline: Optional[float] = None) -> str:
+        """Generate text for a free-form prompt, cached by the prompt text"""
+        cache_key = stable_hash("content", settings.MODEL_NAME, prompt)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        text = await self._generate(prompt, deadline)
+        self.cache.set(cache_key, text)
+        return text
 
-        return response.text
+    async def _generate(self, prompt: str, deadline: Optional[float] = None) -> str:
+        # deadline is a time.monotonic() value the call must finish by
+        return await self.client.generate(prompt, deadline=deadline)
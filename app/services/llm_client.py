@@ -0,0 +1,196 @@
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+from app.config import get_settings
+from functools import lru_cache
+from typing import AsyncIterator, Dict, Optional
+import asyncio
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+# Errors worth another attempt; anything else fails the call immediately
+RETRYABLE_ERRORS = (
+    asyncio.TimeoutError,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.InternalServerError,
+)
+
+
+class LLMUnavailableError(Exception):
+    """Raised when the LLM budget is exhausted or every attempt failed"""
+
+
+class LLMClient:
+    """Async Gemini client with a concurrency budget, deadlines and retries.
+
+    Uses the SDK's native async API, so LLM calls never occupy the default
+    thread pool shared with the database work of other agents.
+    """
+
+    def __init__(
+        self,
+        model,
+        max_concurrency: int = 8,
+        timeout: float = 20,
+        queue_timeout: float = 2,
+        max_retries: int = 2,
+        backoff_base: float = 0.5
+    ):
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.metrics = {
+            "calls": 0,
+            "failures": 0,
+            "retries": 0,
+            "timeouts": 0,
+            "rejected": 0,
+            "deadline_exceeded": 0,
+            "in_flight": 0
+        }
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def _remaining(self, deadline: Optional[float]) -> Optional[float]:
+        if deadline is None:
+            return None
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            self.metrics["deadline_exceeded"] += 1
+            raise LLMUnavailableError("Request deadline reached")
+        return remaining
+
+    async def _acquire(self, deadline: Optional[float] = None) -> None:
+        """Wait for a concurrency slot, giving up after queue_timeout"""
+        remaining = self._remaining(deadline)
+        queue_timeout = self.queue_timeout if remaining is None else min(self.queue_timeout, remaining)
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), queue_timeout)
+        except asyncio.TimeoutError:
+            self.metrics["rejected"] += 1
+            raise LLMUnavailableError("LLM concurrency budget exhausted")
+        self.metrics["in_flight"] += 1
+
+    def _release(self) -> None:
+        self.metrics["in_flight"] -= 1
+        self.semaphore.release()
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: uniform in [0, base * 2^attempt]
+        return random.uniform(0, self.backoff_base * 2 ** attempt)
+
+    async def generate(self, prompt: str, timeout: Optional[float] = None, deadline: Optional[float] = None) -> str:
+        """Generate text for a prompt within the per-call timeout.
+
+        With a deadline (a time.monotonic() value), attempts and backoff are
+        also cut short so the whole call ends by then.
+        """
+        timeout = timeout or self.timeout
+        await self._acquire(deadline)
+        try:
+            self.metrics["calls"] += 1
+            for attempt in range(self.max_retries + 1):
+                remaining = self._remaining(deadline)
+                try:
+                    response = await asyncio.wait_for(
+                        self.model.generate_content_async(prompt),
+                        timeout if remaining is None else min(timeout, remaining)
+                    )
+                    return response.text
+                except RETRYABLE_ERRORS as e:
+                    if isinstance(e, asyncio.TimeoutError):
+                        self.metrics["timeouts"] += 1
+                    if attempt == self.max_retries or (deadline is not None and time.monotonic() >= deadline):
+                        self.metrics["failures"] += 1
+                        raise LLMUnavailableError(f"LLM call failed after {attempt + 1} attempts: {e!r}") from e
+                    self.metrics["retries"] += 1
+                    delay = self._backoff(attempt)
+                    if deadline is not None:
+                        delay = min(delay, max(deadline - time.monotonic(), 0))
+                    logger.warning(f"LLM call failed ({e!r}), retrying in {delay:.2f}s")
+                    await asyncio.sleep(delay)
+        finally:
+            self._release()
+
+    async def stream(
+        self,
+        prompt: str,
+        timeout: Optional[float] = None,
+        deadline: Optional[float] = None
+    ) -> AsyncIterator[str]:
+        """Yield text chunks as they arrive, all within one overall deadline.
+
+        Only opening the stream is retried; once chunks have been yielded a
+        failure ends the stream with LLMUnavailableError.
+        """
+        timeout = timeout or self.timeout
+        deadline = min(time.monotonic() + timeout, deadline or float("inf"))
+        await self._acquire(deadline)
+        try:
+            self.metrics["calls"] += 1
+            for attempt in range(self.max_retries + 1):
+                try:
+                    response = await asyncio.wait_for(
+                        self.model.generate_content_async(prompt, stream=True),
+                        deadline - time.monotonic()
+                    )
+                    break
+                except RETRYABLE_ERRORS as e:
+                    if isinstance(e, asyncio.TimeoutError):
+                        self.metrics["timeouts"] += 1
+                    if attempt == self.max_retries or time.monotonic() >= deadline:
+                        self.metrics["failures"] += 1
+                        raise LLMUnavailableError(f"LLM stream failed after {attempt + 1} attempts: {e!r}") from e
+                    self.metrics["retries"] += 1
+                    await asyncio.sleep(min(self._backoff(attempt), max(deadline - time.monotonic(), 0)))
+
+            chunks = response.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), deadline - time.monotonic())
+                except StopAsyncIteration:
+                    return
+                except RETRYABLE_ERRORS as e:
+                    if isinstance(e, asyncio.TimeoutError):
+                        self.metrics["timeouts"] += 1
+                    self.metrics["failures"] += 1
+                    raise LLMUnavailableError(f"LLM stream interrupted: {e!r}") from e
+                if chunk.text:
+                    yield chunk.text
+        finally:
+            self._release()
+
+    def stats(self) -> Dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "timeout_seconds": self.timeout,
+            **self.metrics
+        }
+
+
+@lru_cache()
+def get_llm_client() -> LLMClient:
+    """Application-scoped LLM client; configures Gemini once per process"""
+    settings = get_settings()
+    genai.configure(api_key=settings.GEMINI_API_KEY)
+    return LLMClient(
+        model=genai.GenerativeModel(settings.MODEL_NAME),
+        max_concurrency=settings.LLM_MAX_CONCURRENCY,
+        timeout=settings.LLM_TIMEOUT_SECONDS,
+        queue_timeout=settings.LLM_QUEUE_TIMEOUT_SECONDS,
+        max_retries=settings.LLM_MAX_RETRIES,
+        backoff_base=settings.LLM_BACKOFF_BASE_SECONDS
+    )
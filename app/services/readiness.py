@@ -0,0 +1,57 @@
+from functools import lru_cache
+from typing import Dict, Optional
+import threading
+import time
+
+# Startup phases in the order the background initialization reaches them
+PHASES = ("starting", "db_ready", "index_loading", "index_ready", "llm_warmed")
+
+
+class Readiness:
+    """Tracks how far the background startup initialization has come"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self.phase = PHASES[0]
+        self.phase_seconds: Dict[str, float] = {}
+        self.error: Optional[str] = None
+
+    def advance(self, phase: str) -> None:
+        with self._lock:
+            self.phase = phase
+            self.phase_seconds[phase] = round(time.monotonic() - self._started, 3)
+            # A phase reached after a retry clears the earlier failure
+            self.error = None
+
+    def fail(self, error: str) -> None:
+        with self._lock:
+            self.error = error
+
+    def reached(self, phase: str) -> bool:
+        return PHASES.index(self.phase) >= PHASES.index(phase)
+
+    @property
+    def db_ready(self) -> bool:
+        return self.reached("db_ready")
+
+    @property
+    def vector_ready(self) -> bool:
+        """Vector search and the category index may be used"""
+        return self.reached("index_ready")
+
+    def stats(self) -> Dict:
+        return {
+            "phase": self.phase,
+            "ready": self.vector_ready,
+            # Until the vector index is ready recommendations come from SQL only
+            "mode": "full" if self.vector_ready else "sql_only",
+            "phase_seconds": dict(self.phase_seconds),
+            "error": self.error
+        }
+
+
+@lru_cache()
+def get_readiness() -> Readiness:
+    """Application-scoped startup readiness"""
+    return Readiness()
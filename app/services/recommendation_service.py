@@ -1,9 +1,20 @@
-from .vector_store import VectorStore
+from .vector_store import get_vector_store
 from .gemini_service import GeminiService
-from .feedback_analyzer import FeedbackAnalyzer
+from .llm_client import LLMUnavailableError
+from .feedback_analyzer import FeedbackAnalyzer, AsyncFeedbackAnalyzer
+from .cache import get_recommendation_cache, get_profile_cache
+from .category_index import get_category_index, sql_candidates_stmt, candidates_from_products
+from .readiness import get_readiness
+from .request_context import RequestContext, memoized, search_products
+from .deadline import Deadline, deadline_at
+from .telemetry import span, timed, traced
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.models import User, UserBehavior
-from typing import Dict
+from app.config import get_settings
+from app.database import run_query
+from typing import AsyncIterator, Dict, Optional, Tuple
 import asyncio
 import logging
 from datetime import datetime, timedelta
@@ -12,130 +23,367 @@ from fastapi import HTTPException
 logger = logging.getLogger(__name__)
 
 class RecommendationService:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, gemini_service: Optional[GeminiService] = None):
         self.db = db
-        self.vector_store = VectorStore()
+        self.category_index = get_category_index()
         self.feedback_analyzer = FeedbackAnalyzer(db)
-        self.gemini_service = GeminiService()
-        self.cache = {}
-        self.cache_timeout = timedelta(minutes=5)
+        self.gemini_service = gemini_service or GeminiService()
+        # Shared across requests so the cache survives per-request construction
+        self.cache = get_recommendation_cache()
+        self.profile_cache = get_profile_cache()
     
-    def _get_cache_key(self, user_id: str, query: str = None) -> str:
-        return f"{user_id}:{query or 'default'}"
-    
-    def _is_cache_valid(self, timestamp: datetime) -> bool:
-        return datetime.utcnow() - timestamp < self.cache_timeout
-    
-    async def _get_user_profile_async(self, user_id: str) -> Dict:
-        """Get user profile asynchronously"""
-        user = self.db.query(User).filter(User.id == user_id).first()
+    @property
+    def vector_store(self):
+        # Resolved on use, so SQL-only requests never wait for Chroma to open
+        return get_vector_store()
+
+    def _user_stmt(self, user_id: str):
+        return select(User.id, User.age).where(User.id == user_id)
+
+    def _behavior_counts_stmt(self, user_id: str):
+        stmt = select(
+            UserBehavior.category,
+            UserBehavior.action,
+            func.count()
+        ).where(
+            UserBehavior.user_id == user_id
+        )
+        window_days = get_settings().PROFILE_WINDOW_DAYS
+        if window_days:
+            stmt = stmt.where(
+                UserBehavior.timestamp >= datetime.utcnow() - timedelta(days=window_days)
+            )
+        return stmt.group_by(UserBehavior.category, UserBehavior.action)
+
+    def _build_profile(self, user_id: str, user, behavior_counts) -> Dict:
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
-        behaviors = self.db.query(UserBehavior).filter(
-            UserBehavior.user_id == user_id
-        ).all()
-        
-
         category_counts = {}
-        total_purchases = 0
-        for behavior in behaviors:
-            if behavior.category in category_counts:
-                category_counts[behavior.category] += 1
-            else:
-                category_counts[behavior.category] = 1
-            total_purchases += 1
+        action_counts = {}
+        category_actions = {}
+        for category, action, count in behavior_counts:
+            category_counts[category] = category_counts.get(category, 0) + count
+            action_counts[action] = action_counts.get(action, 0) + count
+            category_actions.setdefault(category, {})[action] = count
         
-        return {
+        profile = {
             "user_info": {
                 "id": user.id,
                 "age": user.age
             },
             "behavior_summary": {
-                "total_purchases": total_purchases,
-                "favorite_categories": category_counts
+                "total_purchases": action_counts.get("purchase", 0),
+                "total_interactions": sum(action_counts.values()),
+                "action_counts": action_counts,
+                # Most frequent category first
+                "favorite_categories": dict(
+                    sorted(category_counts.items(), key=lambda item: item[1], reverse=True)
+                ),
+                "category_actions": category_actions,
+                "window_days": get_settings().PROFILE_WINDOW_DAYS
             }
         }
+        self.profile_cache.set(user_id, profile)
+        return profile
+
+    def get_user_profile(self, user_id: str, db: Optional[Session] = None) -> Dict:
+        """Build the user profile from per-(category, action) counts computed in SQL"""
+        db = db or self.db
+        cached = self.profile_cache.get(user_id)
+        if cached is not None:
+            return cached
+        return self._get_user_profile_with_session(db, user_id)
+
+    def _get_user_profile_with_session(self, db: Session, user_id: str) -> Dict:
+        user = db.execute(self._user_stmt(user_id)).first()
+        behavior_counts = db.execute(self._behavior_counts_stmt(user_id)).all() if user else []
+        return self._build_profile(user_id, user, behavior_counts)
+
+    async def _get_user_profile_with_async_session(self, db: AsyncSession, user_id: str) -> Dict:
+        user = (await db.execute(self._user_stmt(user_id))).first()
+        behavior_counts = (await db.execute(self._behavior_counts_stmt(user_id))).all() if user else []
+        return self._build_profile(user_id, user, behavior_counts)
+
+    async def _get_user_profile_async(self, user_id: str) -> Dict:
+        """Get user profile with its own session, off the event loop"""
+        cached = self.profile_cache.get(user_id)
+        if cached is not None:
+            return cached
+        return await run_query(
+            lambda db: self._get_user_profile_with_session(db, user_id),
+            lambda db: self._get_user_profile_with_async_session(db, user_id)
+        )
 
     async def _get_feedback_stats_async(self, user_id: str) -> Dict:
-        """Get feedback statistics asynchronously"""
-        return self.feedback_analyzer.get_user_feedback_stats(user_id)
+        """Get feedback statistics with its own session, off the event loop"""
+        return await run_query(
+            lambda db: FeedbackAnalyzer(db).get_user_feedback_stats(user_id),
+            lambda db: AsyncFeedbackAnalyzer(db).get_user_feedback_stats(user_id)
+        )
+
+    async def _get_global_feedback_stats_async(self) -> Dict:
+        return await run_query(
+            lambda db: FeedbackAnalyzer(db).get_global_feedback_stats(),
+            lambda db: AsyncFeedbackAnalyzer(db).get_global_feedback_stats()
+        )
+
+    async def _get_products_feedback_stats_async(self, product_ids) -> Dict:
+        return await run_query(
+            lambda db: FeedbackAnalyzer(db).get_products_feedback_stats(product_ids),
+            lambda db: AsyncFeedbackAnalyzer(db).get_products_feedback_stats(product_ids)
+        )
+
+    async def _search_similar_products_async(
+        self,
+        query: str,
+        n_results: int = 10,
+        context: Optional[RequestContext] = None
+    ) -> Dict:
+        """Run the blocking Chroma query off the event loop, once per request context"""
+        return await search_products(context, self.vector_store, query, n_results)
+
+    async def _sql_candidates_async(self, category: Optional[str], query: Optional[str], n_results: int = 10) -> Dict:
+        """Candidates from the products table alone, for when vector search is unavailable"""
+        stmt = sql_candidates_stmt(category, query, n_results)
+
+        async def fetch_async(db: AsyncSession):
+            return (await db.execute(stmt)).scalars().all()
 
-    async def get_recommendations(self, user_id: str, query: str = None) -> Dict:
+        products = await run_query(lambda db: db.execute(stmt).scalars().all(), fetch_async)
+        return candidates_from_products(products)
+
+    @timed("recommendations.prepare")
+    async def prepare_recommendations(
+        self,
+        user_id: str,
+        query: str = None,
+        context: Optional[RequestContext] = None
+    ) -> Dict:
+        """Collect everything a recommendation needs except the LLM text.
+
+        With a request context, each lookup is shared with the other agents
+        of the same request instead of being repeated, and candidates come
+        from SQL when too little of the request deadline is left for vector
+        search.
+        """
+        deadline = context.deadline if context else None
+        vector_ready = get_readiness().vector_ready and (
+            deadline is None
+            or deadline.allows("recommendations.vector_search", get_settings().DEADLINE_MIN_VECTOR_MS / 1000)
+        )
+        
+        # Profile, feedback stats and the vector search are independent: each
+        # DB step gets its own session in the DB pool and runs concurrently
+        lookups = [
+            memoized(context, ("profile", user_id), lambda: traced(
+                "recommendations.profile", self._get_user_profile_async(user_id)
+            )),
+            memoized(context, ("user_feedback", user_id), lambda: traced(
+                "recommendations.user_feedback", self._get_feedback_stats_async(user_id)
+            )),
+            memoized(context, ("global_feedback",), lambda: traced(
+                "recommendations.global_feedback", self._get_global_feedback_stats_async()
+            ))
+        ]
+        if query and vector_ready:
+            lookups.append(traced(
+                "recommendations.vector_search",
+                self._search_similar_products_async(query, n_results=10, context=context)
+            ))
+        
+        user_profile, feedback_stats, global_feedback_stats, *search_results = await asyncio.gather(*lookups)
+        
+        # Get low-rated products
+        low_rated_products = feedback_stats["low_rated_products"]
+        
+        favorite_categories = user_profile["behavior_summary"]["favorite_categories"]
+        default_category = next(iter(favorite_categories)) if favorite_categories else "Electronics"
+        
+        # Search similar products with vector search
+        if not vector_ready:
+            # Degraded mode while the vector index loads (or the deadline is
+            # close): keyword/category match in SQL
+            similar_products = await traced("recommendations.sql_candidates", self._sql_candidates_async(
+                None if query else default_category, query, n_results=10
+            ))
+        elif query:
+            similar_products = search_results[0]
+        else:
+            # Precomputed candidates avoid embedding and ANN search entirely
+            similar_products = self.category_index.get(default_category, n_results=10)
+            if similar_products is None:
+                similar_products = await traced("recommendations.vector_search", self._search_similar_products_async(
+                    f"best products in {default_category}", n_results=10, context=context
+                ))
+        
+        # Filter low-rated products
+        filtered_products = {
+            "ids": [],
+            "documents": [],
+            "metadatas": [],
+            "distances": []
+        }
+        
+        for i, product_id in enumerate(similar_products["ids"]):
+            if product_id not in low_rated_products:
+                filtered_products["ids"].append(product_id)
+                filtered_products["documents"].append(similar_products["documents"][i])
+                filtered_products["metadatas"].append(similar_products["metadatas"][i])
+                if similar_products.get("distances"):
+                    filtered_products["distances"].append(similar_products["distances"][i])
+        
+        # Get first 5 products
+        for key in filtered_products:
+            filtered_products[key] = filtered_products[key][:5]
+        
+        # Add feedback statistics for each product (one grouped query)
+        product_ids = filtered_products["ids"]
+        products_feedback_stats = await memoized(
+            context,
+            ("products_feedback", tuple(product_ids)),
+            lambda: traced("recommendations.products_feedback", self._get_products_feedback_stats_async(product_ids))
+        )
+        for product_id, metadata in zip(filtered_products["ids"], filtered_products["metadatas"]):
+            metadata["feedback_stats"] = products_feedback_stats[product_id]
+        
+        return {
+            "user_profile": user_profile,
+            "user_feedback_stats": feedback_stats,
+            "similar_products": filtered_products,
+            "feedback_stats": global_feedback_stats,
+            "vector_search": vector_ready
+        }
+
+    def _llm_allowed(self, deadline: Optional[Deadline]) -> bool:
+        """Enough time left for the LLM; a skipped call counts as a miss"""
+        return deadline is None or deadline.allows(
+            "recommendations.llm", get_settings().DEADLINE_MIN_LLM_MS / 1000
+        )
+
+    def _record_llm_miss(self, deadline: Optional[Deadline]) -> None:
+        """Count an LLM call cut short by the deadline (skipped calls are already counted)"""
+        if deadline is not None and deadline.expired and "recommendations.llm" not in deadline.missed:
+            deadline.miss("recommendations.llm")
+
+    @timed("recommendations")
+    async def get_recommendations(
+        self,
+        user_id: str,
+        query: str = None,
+        context: Optional[RequestContext] = None
+    ) -> Dict:
         """Create personalized recommendations for a user"""
-        cache_key = f"{user_id}:{query or 'default'}"
+        cache_key = self.cache.key(user_id, query)
         
         # Cache control
-        if cache_key in self.cache:
-            data, timestamp = self.cache[cache_key]
-            if datetime.utcnow() - timestamp < self.cache_timeout:
-                return data
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
 
         try:
-            # Create tasks for parallel operations
-            user_profile_task = asyncio.create_task(self._get_user_profile_async(user_id))
-            feedback_stats_task = asyncio.create_task(self._get_feedback_stats_async(user_id))
-            
-            # Wait for parallel operations
-            user_profile = await user_profile_task
-            feedback_stats = await feedback_stats_task
-            
-            # Get low-rated products
-            low_rated_products = feedback_stats["low_rated_products"]
-            
-            # Search similar products with vector search
-            if query:
-                similar_products = self.vector_store.search_similar_products(query, n_results=10)
-            else:
-                favorite_categories = user_profile["behavior_summary"]["favorite_categories"]
-                default_category = next(iter(favorite_categories)) if favorite_categories else "Electronics"
-                similar_products = self.vector_store.search_similar_products(f"best products in {default_category}", n_results=10)
+            # Memoized so a coordinator whose deadline ran out can still use the products
+            prepared = await memoized(
+                context,
+                ("prepared", user_id, query),
+                lambda: self.prepare_recommendations(user_id, query, context)
+            )
+            deadline = context.deadline if context else None
             
-            # Filter low-rated products
-            filtered_products = {
-                "ids": [],
-                "documents": [],
-                "metadatas": [],
-                "distances": []
-            }
-            
-            for i, product_id in enumerate(similar_products["ids"]):
-                if product_id not in low_rated_products:
-                    filtered_products["ids"].append(product_id)
-                    filtered_products["documents"].append(similar_products["documents"][i])
-                    filtered_products["metadatas"].append(similar_products["metadatas"][i])
-                    if similar_products.get("distances"):
-                        filtered_products["distances"].append(similar_products["distances"][i])
-            
-            # Get first 5 products
-            for key in filtered_products:
-                filtered_products[key] = filtered_products[key][:5]
-            
-            # Add feedback statistics for each product
-            for metadata in filtered_products["metadatas"]:
-                product_id = filtered_products["ids"][filtered_products["metadatas"].index(metadata)]
-                product_feedback_stats = self.feedback_analyzer.get_product_feedback_stats(product_id)
-                metadata["feedback_stats"] = product_feedback_stats
-            
-            # Get global feedback statistics
-            global_feedback_stats = self.feedback_analyzer.get_global_feedback_stats()
+            # Without LLM budget, still return the structured products
+            try:
+                if not self._llm_allowed(deadline):
+                    raise LLMUnavailableError("Not enough of the request deadline left for the LLM")
+                with span("recommendations.llm"):
+                    recommendations_text = await self.gemini_service.generate_recommendation(
+                        user_profile=prepared["user_profile"],
+                        products=prepared["similar_products"],
+                        feedback_stats=prepared["user_feedback_stats"],
+                        deadline=deadline_at(deadline)
+                    )
+                llm_available = True
+            except LLMUnavailableError as e:
+                logger.warning(f"Returning recommendations without text: {str(e)}")
+                self._record_llm_miss(deadline)
+                recommendations_text = ""
+                llm_available = False
             
             result = {
-                "user_profile": user_profile,
-                "recommendations": await self.gemini_service.generate_recommendation(
-                    user_profile=user_profile,
-                    products=filtered_products,
-                    feedback_stats=feedback_stats
-                ),
-                "similar_products": filtered_products,
-                "feedback_stats": global_feedback_stats
+                "user_profile": prepared["user_profile"],
+                "recommendations": recommendations_text,
+                "similar_products": prepared["similar_products"],
+                "feedback_stats": prepared["feedback_stats"],
+                "degraded": not (llm_available and prepared["vector_search"]),
+                "vector_search": prepared["vector_search"]
             }
             
-            # Cache the result
-            self.cache[cache_key] = (result, datetime.utcnow())
+            # Cache the result (degraded results are retried on the next request)
+            if not result["degraded"]:
+                self.cache.set(cache_key, result)
             
             return result
             
         except Exception as e:
             logger.error(f"Error in get_recommendations: {str(e)}")
             raise
+
+    async def stream_recommendations(
+        self,
+        user_id: str,
+        query: str = None,
+        context: Optional[RequestContext] = None
+    ) -> AsyncIterator[Tuple[str, Dict]]:
+        """Yield (event, data) pairs: the products first, then LLM text chunks.
+
+        Events are "context" (user profile, products and feedback stats),
+        any number of "chunk" events and a final "done".
+        """
+        cache_key = self.cache.key(user_id, query)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            yield "context", {
+                "user_profile": cached["user_profile"],
+                "similar_products": cached["similar_products"],
+                "feedback_stats": cached["feedback_stats"]
+            }
+            yield "chunk", {"text": cached["recommendations"]}
+            yield "done", {"degraded": False, "vector_search": True}
+            return
+
+        prepared = await self.prepare_recommendations(user_id, query, context)
+        yield "context", {
+            "user_profile": prepared["user_profile"],
+            "similar_products": prepared["similar_products"],
+            "feedback_stats": prepared["feedback_stats"]
+        }
+
+        deadline = context.deadline if context else None
+        chunks = []
+        try:
+            if not self._llm_allowed(deadline):
+                raise LLMUnavailableError("Not enough of the request deadline left for the LLM")
+            async for text in self.gemini_service.stream_recommendation(
+                user_profile=prepared["user_profile"],
+                products=prepared["similar_products"],
+                feedback_stats=prepared["user_feedback_stats"],
+                deadline=deadline_at(deadline)
+            ):
+                chunks.append(text)
+                yield "chunk", {"text": text}
+            llm_available = True
+        except LLMUnavailableError as e:
+            logger.warning(f"Recommendation stream ended without full text: {str(e)}")
+            self._record_llm_miss(deadline)
+            llm_available = False
+
+        degraded = not (llm_available and prepared["vector_search"])
+        if not degraded:
+            self.cache.set(cache_key, {
+                "user_profile": prepared["user_profile"],
+                "recommendations": "".join(chunks),
+                "similar_products": prepared["similar_products"],
+                "feedback_stats": prepared["feedback_stats"],
+                "degraded": False,
+                "vector_search": True
+            })
+        yield "done", {"degraded": degraded, "vector_search": prepared["vector_search"]}
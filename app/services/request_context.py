@@ -0,0 +1,81 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+from app.services.deadline import Deadline
+import asyncio
+import copy
+
+# Nearest neighbours fetched once per query; enough for any agent limit (max 20)
+ANN_POOL_SIZE = 20
+
+
+class RequestContext:
+    """Per-request memo of expensive sub-results shared across agents.
+
+    Each key's factory runs at most once per request. Callers asking for a
+    key that is still being computed await the same task, so concurrent
+    agents never duplicate an embedding, ANN query or SQL aggregate.
+    """
+
+    def __init__(self, deadline: Optional[Deadline] = None):
+        self.deadline = deadline
+        self._tasks: Dict[Hashable, asyncio.Future] = {}
+        self.computed = 0
+        self.reused = 0
+
+    async def memo(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._tasks.get(key)
+        if task is None:
+            self.computed += 1
+            task = self._tasks[key] = asyncio.ensure_future(factory())
+        else:
+            self.reused += 1
+        # One caller giving up must not cancel the computation for the others
+        return await asyncio.shield(task)
+
+    def peek(self, key: Hashable) -> Any:
+        """The result for key if it has already been computed successfully, else None"""
+        task = self._tasks.get(key)
+        if task is None or not task.done() or task.cancelled() or task.exception() is not None:
+            return None
+        return task.result()
+
+    def stats(self) -> Dict:
+        return {
+            "computed": self.computed,
+            "reused": self.reused,
+            "steps": sorted({str(key[0]) for key in self._tasks})
+        }
+
+
+async def memoized(context: Optional[RequestContext], key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+    """context.memo(key, factory), or just factory() outside a coordinated request"""
+    if context is None:
+        return await factory()
+    return await context.memo(key, factory)
+
+
+async def search_products(context: Optional[RequestContext], vector_store, query: str, n_results: int) -> Dict:
+    """Vector search that embeds and queries each text at most once per request.
+
+    The ANN query fetches ANN_POOL_SIZE neighbours, and callers get copies
+    sliced to their own n_results.
+    """
+    loop = asyncio.get_running_loop()
+    if context is None or n_results > ANN_POOL_SIZE:
+        return await loop.run_in_executor(
+            None,
+            lambda: vector_store.search_similar_products(query, n_results=n_results)
+        )
+
+    embedding = await context.memo(("embedding", query), lambda: loop.run_in_executor(
+        None,
+        lambda: vector_store.embed_queries([query])[0]
+    ))
+    results = await context.memo(("ann", query), lambda: loop.run_in_executor(
+        None,
+        lambda: vector_store.query_embeddings([embedding], n_results=ANN_POOL_SIZE)[0]
+    ))
+    # Callers annotate the metadatas, so hand out copies
+    return {
+        key: copy.deepcopy(values[:n_results]) if values is not None else None
+        for key, values in results.items()
+    }
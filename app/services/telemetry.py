@@ -0,0 +1,182 @@
+from opentelemetry import context, trace
+from opentelemetry.trace import Status, StatusCode
+from app.config import get_settings
+from contextlib import contextmanager
+from functools import lru_cache, wraps
+from typing import Dict, Iterator, List, Optional, Tuple
+import asyncio
+import bisect
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds, from sub-millisecond cache hits to slow LLM calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRIC_PREFIX = "shopiz"
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus data model"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        # One count per bucket plus the +Inf overflow
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """(le, count) pairs, +Inf last"""
+        pairs = []
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            pairs.append(("+Inf" if bound == float("inf") else repr(bound), total))
+        return pairs
+
+
+class Telemetry:
+    """Stage timings as histograms, mirrored as OpenTelemetry spans.
+
+    Spans go to whatever tracer provider is installed, so they cost next to
+    nothing until tracing is enabled with OTEL_ENABLED.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.durations: Dict[str, Histogram] = {}
+        self.errors: Dict[str, int] = {}
+        self.tracer = trace.get_tracer("shopiz")
+
+    def observe(self, stage: str, seconds: float, error: bool = False) -> None:
+        with self._lock:
+            histogram = self.durations.get(stage)
+            if histogram is None:
+                histogram = self.durations[stage] = Histogram()
+            histogram.observe(seconds)
+            if error:
+                self.errors[stage] = self.errors.get(stage, 0) + 1
+
+    @contextmanager
+    def span(self, stage: str, current: bool = True, **attributes) -> Iterator[trace.Span]:
+        """Time a block as one stage and record it as a span.
+
+        Pass current=False for blocks that span yields of a generator: such a
+        span is not made the active one, since the generator may be resumed
+        in another context.
+        """
+        start = time.perf_counter()
+        error = False
+        span = self.tracer.start_span(stage, attributes=attributes)
+        token = context.attach(trace.set_span_in_context(span)) if current else None
+        try:
+            yield span
+        except BaseException as e:
+            error = True
+            span.record_exception(e)
+            span.set_status(Status(StatusCode.ERROR, str(e)))
+            raise
+        finally:
+            if token is not None:
+                context.detach(token)
+            span.end()
+            self.observe(stage, time.perf_counter() - start, error)
+
+    def timed(self, stage: str):
+        """Decorator form of span for sync and async functions"""
+        def decorator(func):
+            if asyncio.iscoroutinefunction(func):
+                @wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.span(stage):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(stage):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    async def traced(self, stage: str, awaitable):
+        """Await something inside a span"""
+        with self.span(stage):
+            return await awaitable
+
+    def render(self, counters: Optional[Dict[str, Dict[str, int]]] = None) -> str:
+        """Prometheus text exposition of the histograms and extra per-stage counters"""
+        with self._lock:
+            durations = {stage: (h.cumulative(), h.sum, h.count) for stage, h in sorted(self.durations.items())}
+            errors = dict(sorted(self.errors.items()))
+
+        name = f"{METRIC_PREFIX}_stage_duration_seconds"
+        lines = [
+            f"# HELP {name} Time spent in each stage of request handling.",
+            f"# TYPE {name} histogram"
+        ]
+        for stage, (buckets, total, count) in durations.items():
+            for le, value in buckets:
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{le}"}} {value}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {total:.6f}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {count}')
+
+        counters = {"stage_errors_total": errors, **(counters or {})}
+        for counter, values in counters.items():
+            counter_name = f"{METRIC_PREFIX}_{counter}"
+            lines.append(f"# TYPE {counter_name} counter")
+            for stage, value in sorted(values.items()):
+                lines.append(f'{counter_name}{{stage="{stage}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+@lru_cache()
+def get_telemetry() -> Telemetry:
+    """Application-scoped stage timings"""
+    return Telemetry()
+
+
+def span(stage: str, current: bool = True, **attributes):
+    return get_telemetry().span(stage, current, **attributes)
+
+
+def timed(stage: str):
+    return get_telemetry().timed(stage)
+
+
+def traced(stage: str, awaitable):
+    return get_telemetry().traced(stage, awaitable)
+
+
+def add_event(name: str, attributes: Dict) -> None:
+    """Attach an event to the current span, if tracing is enabled"""
+    current = trace.get_current_span()
+    if current.is_recording():
+        # Span attributes must be primitives
+        current.add_event(name, {key: str(value) for key, value in attributes.items()})
+
+
+def setup_tracing(app) -> None:
+    """Install an OTLP-exporting tracer provider and instrument the app when enabled"""
+    settings = get_settings()
+    if not settings.OTEL_ENABLED:
+        return
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+    from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+
+    provider = TracerProvider(resource=Resource.create({"service.name": settings.OTEL_SERVICE_NAME}))
+    # Endpoint and headers come from the standard OTEL_EXPORTER_OTLP_* variables
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    trace.set_tracer_provider(provider)
+    FastAPIInstrumentor.instrument_app(app, excluded_urls="metrics,health,ready")
+    logger.info(f"OpenTelemetry tracing enabled for {settings.OTEL_SERVICE_NAME}")
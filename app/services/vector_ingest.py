@@ -0,0 +1,182 @@
+from chromadb.utils import embedding_functions
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models import Product, SyncState
+from app.services.vector_store import VectorStore, get_vector_store, product_document
+from app.config import get_settings
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from collections import deque
+from typing import Dict, Iterator, List, Optional
+import json
+import logging
+import multiprocessing
+import os
+import numpy as np
+import time
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_NAME = "vector_ingest"
+# (updated_at, id) of the newest product known to be in the vector store
+WATERMARK_NAME = "vector_sync"
+
+# Columns that make up the document and metadata of a product
+PRODUCT_COLUMNS = (
+    Product.id, Product.name, Product.category, Product.brand,
+    Product.description, Product.price, Product.rating
+)
+
+
+def load_sync_state(db: Session, name: str) -> Optional[Dict]:
+    state = db.get(SyncState, name)
+    return json.loads(state.value) if state else None
+
+
+def save_sync_state(db: Session, name: str, value: Dict) -> None:
+    db.merge(SyncState(name=name, value=json.dumps(value)))
+    db.commit()
+
+
+def clear_sync_state(db: Session, name: str) -> None:
+    db.query(SyncState).filter(SyncState.name == name).delete()
+    db.commit()
+
+
+def latest_watermark(db: Session) -> Optional[Dict]:
+    row = db.execute(
+        select(Product.updated_at, Product.id)
+        .where(Product.updated_at.isnot(None))
+        .order_by(Product.updated_at.desc(), Product.id.desc())
+        .limit(1)
+    ).first()
+    return {"updated_at": row.updated_at.isoformat(), "id": row.id} if row else None
+
+
+def ingestion_pending() -> bool:
+    """True when a previous ingestion stopped before finishing"""
+    db = SessionLocal()
+    try:
+        return load_sync_state(db, CHECKPOINT_NAME) is not None
+    finally:
+        db.close()
+
+
+# Each worker process loads the embedding model once
+_embedding_function = None
+
+
+def _init_worker() -> None:
+    global _embedding_function
+    _embedding_function = embedding_functions.DefaultEmbeddingFunction()
+
+
+def _embed(documents: List[str]) -> np.ndarray:
+    # float32 arrays pickle far smaller than lists of floats
+    return np.asarray(_embedding_function(documents), dtype=np.float32)
+
+
+class VectorIngestor:
+    """Loads the products table into the vector store.
+
+    Products are read in id order with keyset pagination, embedded in a
+    process pool while the next batches are read, and upserted with their
+    precomputed embeddings. Progress is checkpointed after every batch, so
+    an interrupted run resumes after the last upserted id.
+    """
+
+    def __init__(
+        self,
+        vector_store: Optional[VectorStore] = None,
+        batch_size: Optional[int] = None,
+        workers: Optional[int] = None
+    ):
+        settings = get_settings()
+        self.vector_store = vector_store or get_vector_store()
+        self.batch_size = batch_size or settings.VECTOR_INGEST_BATCH_SIZE
+        self.workers = workers or settings.VECTOR_INGEST_WORKERS or os.cpu_count() or 1
+        # Enough batches in flight to keep every worker busy while we upsert
+        self.max_in_flight = self.workers * 2
+
+    def _executor(self) -> Executor:
+        if self.workers <= 1:
+            return ThreadPoolExecutor(max_workers=1, initializer=_init_worker)
+        # spawn: forking a process that already runs threads and ONNX is unsafe
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker
+        )
+
+    def _batches(self, db: Session, after_id: Optional[str]) -> Iterator[List[Dict]]:
+        while True:
+            stmt = select(*PRODUCT_COLUMNS).order_by(Product.id).limit(self.batch_size)
+            if after_id is not None:
+                stmt = stmt.where(Product.id > after_id)
+            batch = [dict(row) for row in db.execute(stmt).mappings()]
+            if not batch:
+                return
+            after_id = batch[-1]["id"]
+            yield batch
+
+    def run(self, restart: bool = False) -> Dict:
+        """Ingest every product after the checkpoint (or all, with restart)"""
+        db = SessionLocal()
+        try:
+            checkpoint = None if restart else load_sync_state(db, CHECKPOINT_NAME)
+            after_id = checkpoint["last_id"] if checkpoint else None
+            ingested = checkpoint["ingested"] if checkpoint else 0
+            # Taken before reading, so products changed meanwhile are synced later
+            watermark = checkpoint.get("watermark") if checkpoint else latest_watermark(db)
+            total = db.execute(select(func.count()).select_from(Product)).scalar()
+            if after_id is not None:
+                logger.info(f"Resuming vector ingestion after {after_id} ({ingested}/{total} done)")
+
+            progress = {
+                "ingested": ingested,
+                "this_run": 0,
+                "total": total,
+                "watermark": watermark,
+                "start": time.perf_counter()
+            }
+            with self._executor() as executor:
+                pending = deque()
+                for batch in self._batches(db, after_id):
+                    documents = [product_document(p) for p in batch]
+                    pending.append((batch, executor.submit(_embed, documents)))
+                    # Upsert in id order so the checkpoint never skips a batch
+                    while len(pending) >= self.max_in_flight:
+                        self._write(db, *pending.popleft(), progress)
+                while pending:
+                    self._write(db, *pending.popleft(), progress)
+
+            # A finished run starts from scratch next time; the sync takes over
+            if watermark is not None:
+                save_sync_state(db, WATERMARK_NAME, watermark)
+            clear_sync_state(db, CHECKPOINT_NAME)
+            this_run = progress["this_run"]
+            elapsed = time.perf_counter() - progress["start"]
+            stats = {
+                "ingested": progress["ingested"],
+                "this_run": this_run,
+                "resumed_after": after_id,
+                "seconds": round(elapsed, 3),
+                "products_per_second": round(this_run / elapsed, 1) if elapsed else 0.0
+            }
+            self.vector_store.metrics["ingest_products_per_second"] = stats["products_per_second"]
+            logger.info(f"Vector ingestion finished: {stats}")
+            return stats
+        finally:
+            db.close()
+
+    def _write(self, db: Session, batch: List[Dict], future, progress: Dict) -> None:
+        self.vector_store.upsert_embeddings(batch, future.result())
+        progress["ingested"] += len(batch)
+        progress["this_run"] += len(batch)
+        save_sync_state(db, CHECKPOINT_NAME, {
+            "last_id": batch[-1]["id"],
+            "ingested": progress["ingested"],
+            "watermark": progress["watermark"]
+        })
+        rate = progress["this_run"] / max(time.perf_counter() - progress["start"], 1e-9)
+        logger.info(f"Ingested {progress['ingested']}/{progress['total']} products ({rate:,.0f} products/s)")
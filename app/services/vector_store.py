@@ -1,55 +1,214 @@
 import chromadb
+from chromadb.utils import embedding_functions
+from app.config import get_settings
+from app.services.cache import get_embedding_cache
+from app.services.telemetry import timed
+from typing import Dict, List, Optional
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
 
 
 class VectorStore:
-    def __init__(self):
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or get_settings().VECTOR_DB_PATH
+        self.metrics = {}
+
         # New client creation method
-        self.client = chromadb.PersistentClient(path="./chroma_db")
-        
+        start = time.perf_counter()
+        self.client = chromadb.PersistentClient(path=self.path)
+        self.metrics["client_open_seconds"] = time.perf_counter() - start
+
+        # Load the embedding model once and share it with the collection
+        self.embedding_function = embedding_functions.DefaultEmbeddingFunction()
+
         # Create collection for products
+        start = time.perf_counter()
         self.collection = self.client.get_or_create_collection(
-            name="product_embeddings"
+            name="product_embeddings",
+            embedding_function=self.embedding_function
         )
-    
+        self.metrics["collection_load_seconds"] = time.perf_counter() - start
+
+    def warmup(self) -> None:
+        """Load the embedding model and the HNSW index before the first request"""
+        start = time.perf_counter()
+        self.embedding_function(["warmup"])
+        self.metrics["embedding_warmup_seconds"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        if self.collection.count():
+            self.collection.query(query_texts=["warmup"], n_results=1)
+        self.metrics["index_load_seconds"] = time.perf_counter() - start
+
+    def close(self) -> None:
+        """Release the Chroma client and its SQLite/HNSW resources"""
+        self.client.clear_system_cache()
+
+    def stats(self) -> Dict:
+        return {
+            "path": self.path,
+            "document_count": self.collection.count(),
+            **{key: round(value, 4) for key, value in self.metrics.items()}
+        }
+
     def add_products(self, products):
         """Add products to vector store"""
         ids = [str(p["id"]) for p in products]
-        documents = [
-            f"{p['name']} {p['category']} {p['description']}" 
-            for p in products
-        ]
-        metadatas = [
-            {
-                "category": p["category"],
-                "brand": p["brand"],
-                "price": float(p["price"]),  # ChromaDB expects float value
-                "rating": float(p["rating"])
-            } 
-            for p in products
-        ]
-        
+        documents = [product_document(p) for p in products]
+        metadatas = [product_metadata(p) for p in products]
+
         # Create chunks for batch processing (to avoid ChromaDB limit)
         batch_size = 100
         for i in range(0, len(ids), batch_size):
             batch_ids = ids[i:i + batch_size]
             batch_documents = documents[i:i + batch_size]
             batch_metadatas = metadatas[i:i + batch_size]
-            
+
             self.collection.add(
                 ids=batch_ids,
                 documents=batch_documents,
                 metadatas=batch_metadatas
             )
-    
-    def search_similar_products(self, query, n_results=5):
+
+    @timed("vector_store.upsert")
+    def upsert_embeddings(self, products, embeddings) -> None:
+        """Insert or update products with embeddings computed elsewhere"""
+        max_batch_size = self.client.get_max_batch_size()
+        for i in range(0, len(products), max_batch_size):
+            batch = products[i:i + max_batch_size]
+            self.collection.upsert(
+                ids=[str(p["id"]) for p in batch],
+                embeddings=[
+                    vector.tolist() if hasattr(vector, "tolist") else list(vector)
+                    for vector in embeddings[i:i + max_batch_size]
+                ],
+                documents=[product_document(p) for p in batch],
+                metadatas=[product_metadata(p) for p in batch]
+            )
+
+    @timed("vector_store.update_metadata")
+    def update_metadata(self, products) -> None:
+        """Refresh the metadata of products whose document is unchanged"""
+        max_batch_size = self.client.get_max_batch_size()
+        for i in range(0, len(products), max_batch_size):
+            batch = products[i:i + max_batch_size]
+            self.collection.update(
+                ids=[str(p["id"]) for p in batch],
+                metadatas=[product_metadata(p) for p in batch]
+            )
+
+    def get_documents(self, ids: List[str]) -> Dict[str, str]:
+        """Return the stored documents of the given product ids"""
+        results = self.collection.get(ids=ids, include=["documents"])
+        return dict(zip(results["ids"], results["documents"]))
+
+    def delete(self, ids: List[str]) -> None:
+        self.collection.delete(ids=ids)
+
+    def search_similar_products(self, query, n_results=5, where=None):
         """Search similar products"""
-        results = self.collection.query(
-            query_texts=[query],
-            n_results=n_results
+        return self.search_many([query], n_results=n_results, where=where)[0]
+
+    def search_many(self, queries: List[str], n_results=5, where=None) -> List[Dict]:
+        """Search similar products for each query, like search_similar_products"""
+        # Each chunk is embedded in one pass and answered by a single HNSW query
+        batch_size = get_settings().VECTOR_QUERY_BATCH_SIZE
+        results = []
+        for i in range(0, len(queries), batch_size):
+            batch = list(queries[i:i + batch_size])
+            results.extend(self.query_embeddings(self.embed_queries(batch), n_results=n_results, where=where))
+        return results
+
+    @timed("vector_store.query")
+    def query_embeddings(self, embeddings: List[List[float]], n_results=5, where=None) -> List[Dict]:
+        """Nearest products for already embedded queries, one result per embedding"""
+        response = self.collection.query(
+            query_embeddings=embeddings,
+            n_results=n_results,
+            where=where
         )
+        return [self._unpack_results(response, j) for j in range(len(embeddings))]
+
+    @timed("vector_store.embed")
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed query texts, reusing cached vectors and embedding misses in one batch"""
+        cache = get_embedding_cache()
+        embeddings = [cache.get(query) for query in queries]
+
+        missing = list(dict.fromkeys(
+            query for query, embedding in zip(queries, embeddings) if embedding is None
+        ))
+        if missing:
+            computed = {}
+            for query, vector in zip(missing, self.embedding_function(missing)):
+                vector = vector.tolist() if hasattr(vector, "tolist") else list(vector)
+                cache.set(query, vector)
+                computed[query] = vector
+            embeddings = [
+                embedding if embedding is not None else computed[query]
+                for query, embedding in zip(queries, embeddings)
+            ]
+        return embeddings
+
+    def get_embeddings(self, ids: List[str]) -> Dict[str, List[float]]:
+        """Return the stored embeddings of the given product ids"""
+        results = self.collection.get(ids=ids, include=["embeddings"])
+        embeddings = results.get("embeddings")
+        if embeddings is None:
+            return {}
+        return {product_id: list(vector) for product_id, vector in zip(results["ids"], embeddings)}
+
+    @staticmethod
+    def _unpack_results(results, index: int) -> Dict:
         return {
-            "ids": results["ids"][0],
-            "documents": results["documents"][0],
-            "metadatas": results["metadatas"][0],
-            "distances": results["distances"][0] if "distances" in results else None
-        }
\ No newline at end of file
+            "ids": results["ids"][index],
+            "documents": results["documents"][index],
+            "metadatas": results["metadatas"][index],
+            "distances": results["distances"][index] if results.get("distances") else None
+        }
+
+
+def product_document(product) -> str:
+    """Text that is embedded for a product"""
+    return f"{product['name']} {product['category']} {product['description']}"
+
+
+def product_metadata(product) -> Dict:
+    return {
+        "category": product["category"],
+        "brand": product["brand"],
+        "price": float(product["price"]),  # ChromaDB expects float value
+        "rating": float(product["rating"] or 0)
+    }
+
+
+_vector_store: Optional[VectorStore] = None
+_vector_store_lock = threading.Lock()
+
+
+def get_vector_store() -> VectorStore:
+    """Return the process-wide VectorStore, opening it on first use"""
+    global _vector_store
+    if _vector_store is None:
+        with _vector_store_lock:
+            if _vector_store is None:
+                _vector_store = VectorStore()
+                logger.info("Vector store opened: %s", _vector_store.metrics)
+    return _vector_store
+
+
+def opened_vector_store() -> Optional[VectorStore]:
+    """The process-wide VectorStore if it is already open, without opening it"""
+    return _vector_store
+
+
+def close_vector_store() -> None:
+    """Close the process-wide VectorStore if it was opened"""
+    global _vector_store
+    with _vector_store_lock:
+        if _vector_store is not None:
+            _vector_store.close()
+            _vector_store = None
@@ -0,0 +1,135 @@
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models import Product
+from app.services.vector_store import VectorStore, get_vector_store, product_document
+from app.services.vector_ingest import PRODUCT_COLUMNS, WATERMARK_NAME, load_sync_state, save_sync_state
+from app.config import get_settings
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional
+from datetime import datetime
+import asyncio
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class VectorSync:
+    """Keeps the vector store in step with the products table.
+
+    Products past the (updated_at, id) watermark are re-embedded only when
+    their document text changed; price, rating and other metadata changes
+    are applied without embedding. Once every product is in the collection,
+    any surplus of collection entries over products must be deleted
+    products, so the full reconcile scan only runs in that case.
+    """
+
+    def __init__(self, vector_store: Optional[VectorStore] = None, batch_size: Optional[int] = None):
+        self.vector_store = vector_store or get_vector_store()
+        self.batch_size = batch_size or get_settings().VECTOR_INGEST_BATCH_SIZE
+        self._lock = threading.Lock()
+        self.last_run: Optional[Dict] = None
+
+    def run(self) -> Dict:
+        """Sync changes since the last run; concurrent calls wait for each other"""
+        with self._lock:
+            db = SessionLocal()
+            try:
+                return self._run(db)
+            finally:
+                db.close()
+
+    def _run(self, db: Session) -> Dict:
+        start = time.perf_counter()
+        # Rows from before the column existed count as changed when created
+        db.execute(
+            update(Product).where(Product.updated_at.is_(None)).values(updated_at=Product.created_at)
+        )
+        db.commit()
+
+        stats = {"embedded": 0, "metadata_updated": 0, "deleted": 0}
+        watermark = load_sync_state(db, WATERMARK_NAME)
+        for batch in self._changed(db, watermark):
+            self._apply(batch, stats)
+            last = batch[-1]
+            save_sync_state(db, WATERMARK_NAME, {"updated_at": last["updated_at"].isoformat(), "id": last["id"]})
+        stats["deleted"] = self._reconcile(db)
+
+        stats["seconds"] = round(time.perf_counter() - start, 4)
+        stats["finished_at"] = datetime.utcnow().isoformat()
+        self.last_run = stats
+        if stats["embedded"] or stats["metadata_updated"] or stats["deleted"]:
+            logger.info(f"Vector store synced: {stats}")
+        return stats
+
+    def _changed(self, db: Session, watermark: Optional[Dict]) -> Iterator[List[Dict]]:
+        """Products after the watermark in (updated_at, id) order"""
+        after = (datetime.fromisoformat(watermark["updated_at"]), watermark["id"]) if watermark else None
+        while True:
+            stmt = select(*PRODUCT_COLUMNS, Product.updated_at).where(
+                Product.updated_at.isnot(None)
+            ).order_by(Product.updated_at, Product.id).limit(self.batch_size)
+            if after is not None:
+                stmt = stmt.where(or_(
+                    Product.updated_at > after[0],
+                    and_(Product.updated_at == after[0], Product.id > after[1])
+                ))
+            batch = [dict(row) for row in db.execute(stmt).mappings()]
+            if not batch:
+                return
+            after = (batch[-1]["updated_at"], batch[-1]["id"])
+            yield batch
+
+    def _apply(self, batch: List[Dict], stats: Dict) -> None:
+        stored = self.vector_store.get_documents([p["id"] for p in batch])
+        changed = [p for p in batch if stored.get(p["id"]) != product_document(p)]
+        unchanged = [p for p in batch if stored.get(p["id"]) == product_document(p)]
+        if changed:
+            embeddings = self.vector_store.embedding_function([product_document(p) for p in changed])
+            self.vector_store.upsert_embeddings(changed, embeddings)
+            stats["embedded"] += len(changed)
+        if unchanged:
+            self.vector_store.update_metadata(unchanged)
+            stats["metadata_updated"] += len(unchanged)
+
+    def _reconcile(self, db: Session) -> int:
+        """Delete collection entries whose product no longer exists"""
+        product_count = db.execute(select(func.count()).select_from(Product)).scalar()
+        if self.vector_store.collection.count() <= product_count:
+            return 0
+
+        deleted = 0
+        offset = 0
+        while True:
+            ids = self.vector_store.collection.get(include=[], limit=self.batch_size, offset=offset)["ids"]
+            if not ids:
+                return deleted
+            existing = set(db.execute(select(Product.id).where(Product.id.in_(ids))).scalars())
+            stale = [product_id for product_id in ids if product_id not in existing]
+            if stale:
+                self.vector_store.delete(stale)
+                deleted += len(stale)
+            # Deleted entries no longer take up positions of later pages
+            offset += len(ids) - len(stale)
+
+    def stats(self) -> Dict:
+        return {"last_run": self.last_run}
+
+
+@lru_cache()
+def get_vector_sync() -> VectorSync:
+    """Application-scoped vector store sync"""
+    return VectorSync()
+
+
+async def run_vector_sync(interval: float) -> None:
+    """Sync the vector store with the products table every interval seconds"""
+    loop = asyncio.get_event_loop()
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await loop.run_in_executor(None, get_vector_sync().run)
+        except Exception as e:
+            logger.error(f"Error syncing vector store: {str(e)}")
@@ -0,0 +1,83 @@
+from sqlalchemy import insert
+from sqlalchemy.engine import Engine
+from app.database import engine
+from app.models import User, Product, UserBehavior
+from app.config import get_settings
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Parents before children so foreign keys are satisfied
+GENERATED_TABLES = [
+    ("users", User),
+    ("products", Product),
+    ("user_behaviors", UserBehavior),
+]
+
+
+def chunked(rows: Iterable, size: int) -> Iterator[List]:
+    """Split any iterable into lists of at most size items"""
+    iterator = iter(rows)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def log_progress(table: str, rows: int, elapsed: float) -> None:
+    rate = rows / elapsed if elapsed else 0
+    logger.info(f"Loaded {rows:,} rows into {table} ({rate:,.0f} rows/s)")
+
+
+class BulkLoader:
+    """Streams row dicts into tables with Core executemany in one transaction.
+
+    Skips ORM object construction and the unit of work entirely, and only
+    holds one chunk of rows in memory at a time, so the row count is
+    bounded by disk rather than RAM.
+    """
+
+    def __init__(
+        self,
+        bind: Optional[Engine] = None,
+        chunk_size: Optional[int] = None,
+        progress_every: Optional[int] = None,
+        on_progress: Optional[Callable[[str, int, float], None]] = log_progress
+    ):
+        settings = get_settings()
+        self.bind = bind or engine
+        self.chunk_size = chunk_size or settings.BULK_LOAD_CHUNK_SIZE
+        self.progress_every = progress_every or settings.BULK_LOAD_PROGRESS_EVERY
+        self.on_progress = on_progress
+
+    def load(self, tables: Sequence[Tuple]) -> Dict[str, int]:
+        """Insert (model, rows) pairs in order; all or nothing"""
+        counts = {}
+        with self.bind.begin() as conn:
+            for model, rows in tables:
+                counts[model.__tablename__] = self._load_table(conn, model.__table__, rows)
+        return counts
+
+    def load_generated(self, data: Dict[str, Iterable[Dict]]) -> Dict[str, int]:
+        """Insert DataGenerator output keyed by users/products/user_behaviors"""
+        return self.load([(model, data[key]) for key, model in GENERATED_TABLES if key in data])
+
+    def _load_table(self, conn, table, rows: Iterable[Dict]) -> int:
+        stmt = insert(table)
+        start = time.perf_counter()
+        total = 0
+        next_report = self.progress_every
+        for chunk in chunked(rows, self.chunk_size):
+            # A list of parameter dicts runs as a single DBAPI executemany
+            conn.execute(stmt, chunk)
+            total += len(chunk)
+            if self.on_progress and total >= next_report:
+                self.on_progress(table.name, total, time.perf_counter() - start)
+                next_report += self.progress_every
+        if self.on_progress:
+            self.on_progress(table.name, total, time.perf_counter() - start)
+        return total
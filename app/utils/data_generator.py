@@ -1,10 +1,66 @@
 import random
-from datetime import datetime, timedelta
+from datetime import datetime
+from itertools import chain
+import numpy as np
 import uuid
-from typing import List, Dict
+from typing import List, Dict, Iterator, Optional
+
+# Independent random streams, so each kind of row is reproducible on its own
+_ID_STREAM = 0
+_USER_STREAM = 1
+_PRODUCT_STREAM = 2
+_BEHAVIOR_STREAM = 3
+_CATALOG_STREAM = 4
+_POPULARITY_STREAM = 5
+_ACTIVITY_STREAM = 6
+
+_SECONDS_PER_DAY = 86400
+
+# Odd multiplier: index * _ID_MULTIPLIER mod 2^62 is a bijection that scatters ids
+_ID_MULTIPLIER = 0x9E3779B97F4A7C15
+_ID_MASK = (1 << 62) - 1
+_ID_VARIANT = 1 << 63
+
+
+class _PowerLawSampler:
+    """Samples indices 0..n-1 where the k-th most popular has weight k^-exponent.
+
+    The popularity ranking is a seeded permutation, so popular rows are spread
+    over the id space. An exponent of 0 samples uniformly.
+    """
+
+    def __init__(self, n: int, exponent: float, rng: np.random.Generator):
+        weights = np.arange(1, n + 1, dtype=np.float64) ** -exponent
+        self.cdf = np.cumsum(weights)
+        self.cdf /= self.cdf[-1]
+        self.order = rng.permutation(n)
+
+    def sample(self, rng: np.random.Generator, count: int) -> np.ndarray:
+        ranks = np.searchsorted(self.cdf, rng.random(count), side="right")
+        return self.order[np.minimum(ranks, len(self.order) - 1)]
+
 
 class DataGenerator:
-    def __init__(self):
+    def __init__(
+        self,
+        seed: Optional[int] = None,
+        product_popularity_exponent: float = 1.1,
+        user_activity_exponent: float = 1.0
+    ):
+        # Same seed, same rows (timestamps are relative to construction time)
+        self.seed = seed if seed is not None else np.random.SeedSequence().entropy
+        self.random = random.Random(self.seed)
+        self.product_popularity_exponent = product_popularity_exponent
+        self.user_activity_exponent = user_activity_exponent
+        self.now = datetime.now()
+        id_rng = self._rng(_ID_STREAM)
+        # First 64 bits of every UUID of a kind: "xxxxxxxx-xxxx-4xxx-"
+        self._id_prefixes = {
+            kind: str(uuid.UUID(int=int.from_bytes(id_rng.bytes(8), "big") << 64, version=4))[:19]
+            for kind in ("users", "products", "user_behaviors")
+        }
+        self._catalog: Optional[np.ndarray] = None
+
         self.categories = [
             "Electronics", "Fashion", "Home & Garden", "Books", "Sports", 
             "Beauty", "Toys", "Automotive", "Health", "Grocery",
@@ -212,15 +268,7 @@ class DataGenerator:
             ]
         }
 
-    def generate_product_name(self, category: str, brand: str) -> str:
-        templates = self.product_templates.get(category, ["{brand} Product {id}"])
-        return random.choice(templates).format(
-            brand=brand,
-            id=str(random.randint(100, 999))
-        )
-
-    def generate_description(self, category: str, brand: str, name: str) -> str:
-        features = [
+        self.features = [
             "High quality", "Premium design", "Latest technology",
             "Best seller", "Customer favorite", "Award winning",
             "Innovative", "Eco-friendly", "Professional grade",
@@ -230,8 +278,8 @@ class DataGenerator:
             "Luxury finish", "Premium materials", "Enhanced performance",
             "Space saving", "Versatile", "Multi-functional"
         ]
-        
-        benefits = [
+
+        self.benefits = [
             "Perfect for everyday use",
             "Ideal for professionals",
             "Great for beginners",
@@ -244,81 +292,176 @@ class DataGenerator:
             "Includes free support"
         ]
 
-        return f"{name} by {brand}. {random.choice(features)} product in {category} category. " \
-               f"Features include {', '.join(random.sample(features, 3))}. {random.choice(benefits)}."
+        self.actions = ["view", "cart", "purchase", "wishlist", "review"]
+        # Browsing dominates; purchases and reviews are comparatively rare
+        self.action_weights = [0.55, 0.15, 0.1, 0.12, 0.08]
 
-    def generate_bulk_data(self, num_users=100, num_products=1000, num_behaviors=5000) -> Dict:
-        users = []
-        products = []
-        user_behaviors = []
+    def generate_product_name(self, category: str, brand: str) -> str:
+        templates = self.product_templates.get(category, ["{brand} Product {id}"])
+        return self.random.choice(templates).format(
+            brand=brand,
+            id=str(self.random.randint(100, 999))
+        )
+
+    def generate_description(self, category: str, brand: str, name: str) -> str:
+        return self._format_description(
+            category, brand, name,
+            self.random.choice(self.features),
+            self.random.sample(self.features, 3),
+            self.random.choice(self.benefits)
+        )
+
+    def _format_description(self, category: str, brand: str, name: str,
+                            headline: str, features: List[str], benefit: str) -> str:
+        return f"{name} by {brand}. {headline} product in {category} category. " \
+               f"Features include {', '.join(features)}. {benefit}."
+
+    def _rng(self, stream: int) -> np.random.Generator:
+        return np.random.default_rng([self.seed, stream])
+
+    def _ids(self, kind: str, indices) -> List[str]:
+        """Deterministic version 4 UUIDs from a per-kind random prefix and the row index"""
+        prefix = self._id_prefixes[kind]
+        ids = []
+        for index in indices:
+            low = f"{_ID_VARIANT | (index * _ID_MULTIPLIER) & _ID_MASK:016x}"
+            ids.append(f"{prefix}{low[:4]}-{low[4:]}")
+        return ids
+
+    def _timestamps(self, rng: np.random.Generator, count: int, min_days: int, max_days: int) -> List[datetime]:
+        """Uniform datetimes between max_days and min_days ago"""
+        offsets = rng.integers(min_days * _SECONDS_PER_DAY, (max_days + 1) * _SECONDS_PER_DAY, count)
+        return (np.datetime64(self.now, "us") - offsets.astype("timedelta64[s]")).tolist()
 
-        # Generate Users with unique emails
-        used_emails = set()
-        for i in range(num_users):
-            joined_date = datetime.now() - timedelta(days=random.randint(1, 365))
-            
-            # Benzersiz e-posta oluştur
-            while True:
-                email = f"user_{i}_{random.randint(1000, 9999)}@example.com"
-                if email not in used_emails:
-                    used_emails.add(email)
-                    break
-            
-            user = {
-                "id": str(uuid.uuid4()),
-                "name": f"User_{random.randint(1000, 9999)}",
-                "email": email,
-                "age": random.randint(18, 70),
-                "joined_date": joined_date
-            }
-            users.append(user)
+    def _product_categories(self, num_products: int) -> np.ndarray:
+        """Category index of every product, shared by products and behaviors"""
+        if self._catalog is None or len(self._catalog) != num_products:
+            self._catalog = self._rng(_CATALOG_STREAM).integers(
+                0, len(self.categories), num_products, dtype=np.int8
+            )
+        return self._catalog
+
+    def iter_users(self, num_users: int, chunk_size: int = 10000) -> Iterator[List[Dict]]:
+        rng = self._rng(_USER_STREAM)
+        for start in range(0, num_users, chunk_size):
+            count = min(chunk_size, num_users - start)
+            indices = range(start, start + count)
+            # The row index alone makes emails unique, no retries needed
+            suffixes = rng.integers(1000, 10000, count).tolist()
+            ages = rng.integers(18, 71, count).tolist()
+            joined_dates = self._timestamps(rng, count, 1, 365)
+            yield [
+                {
+                    "id": user_id,
+                    "name": f"User_{suffix}",
+                    "email": f"user_{index}_{suffix}@example.com",
+                    "age": age,
+                    "joined_date": joined_date
+                }
+                for user_id, index, suffix, age, joined_date
+                in zip(self._ids("users", indices), indices, suffixes, ages, joined_dates)
+            ]
+
+    def iter_products(self, num_products: int, chunk_size: int = 10000) -> Iterator[List[Dict]]:
+        rng = self._rng(_PRODUCT_STREAM)
+        catalog = self._product_categories(num_products)
+        for start in range(0, num_products, chunk_size):
+            count = min(chunk_size, num_products - start)
+            categories = catalog[start:start + count].tolist()
+            brand_picks = rng.random(count).tolist()
+            template_picks = rng.random(count).tolist()
+            model_numbers = rng.integers(100, 1000, count).tolist()
+            prices = rng.uniform(10, 1000, count).round(2).tolist()
+            ratings = rng.uniform(3.5, 5, count).round(1).tolist()
+            stocks = rng.integers(0, 101, count).tolist()
+            created_ats = self._timestamps(rng, count, 1, 180)
+            headlines = rng.integers(0, len(self.features), count).tolist()
+            # Three distinct features per product
+            feature_picks = np.argsort(rng.random((count, len(self.features))), axis=1)[:, :3].tolist()
+            benefits = rng.integers(0, len(self.benefits), count).tolist()
+
+            rows = []
+            for i, product_id in enumerate(self._ids("products", range(start, start + count))):
+                category = self.categories[categories[i]]
+                brands = self.brands[category]
+                brand = brands[int(brand_picks[i] * len(brands))]
+                templates = self.product_templates.get(category, ["{brand} Product {id}"])
+                name = templates[int(template_picks[i] * len(templates))].format(
+                    brand=brand,
+                    id=model_numbers[i]
+                )
+                rows.append({
+                    "id": product_id,
+                    "name": name,
+                    "category": category,
+                    "brand": brand,
+                    "price": prices[i],
+                    "description": self._format_description(
+                        category, brand, name,
+                        self.features[headlines[i]],
+                        [self.features[f] for f in feature_picks[i]],
+                        self.benefits[benefits[i]]
+                    ),
+                    "rating": ratings[i],
+                    "stock": stocks[i],
+                    "created_at": created_ats[i]
+                })
+            yield rows
 
-        # Generate Products
-        for _ in range(num_products):
-            category = random.choice(self.categories)
-            brand = random.choice(self.brands[category])
-            name = self.generate_product_name(category, brand)
-            created_at = datetime.now() - timedelta(days=random.randint(1, 180))
-            
-            product = {
-                "id": str(uuid.uuid4()),
-                "name": name,
-                "category": category,
-                "brand": brand,
-                "price": round(random.uniform(10, 1000), 2),
-                "description": self.generate_description(category, brand, name),
-                "rating": round(random.uniform(3.5, 5), 1),
-                "stock": random.randint(0, 100),
-                "created_at": created_at
-            }
-            products.append(product)
+    def iter_behaviors(self, num_behaviors: int, num_users: int, num_products: int,
+                       chunk_size: int = 10000) -> Iterator[List[Dict]]:
+        """Behaviors over the users and products of iter_users/iter_products.
 
-        # Generate User Behaviors
-        actions = ["view", "cart", "purchase", "wishlist", "review"]
-        for _ in range(num_behaviors):
-            user = random.choice(users)
-            product = random.choice(products)
-            action = random.choice(actions)
-            behavior_time = datetime.now() - timedelta(
-                days=random.randint(0, 30),
-                hours=random.randint(0, 23),
-                minutes=random.randint(0, 59)
+        Product popularity follows a Zipf law and user activity a power law;
+        memory is O(num_users + num_products), independent of num_behaviors.
+        """
+        if num_behaviors and (not num_users or not num_products):
+            raise ValueError("Behaviors need at least one user and one product")
+        rng = self._rng(_BEHAVIOR_STREAM)
+        catalog = self._product_categories(num_products)
+        products = _PowerLawSampler(num_products, self.product_popularity_exponent, self._rng(_POPULARITY_STREAM))
+        users = _PowerLawSampler(num_users, self.user_activity_exponent, self._rng(_ACTIVITY_STREAM))
+        for start in range(0, num_behaviors, chunk_size):
+            count = min(chunk_size, num_behaviors - start)
+            user_indices = users.sample(rng, count)
+            product_indices = products.sample(rng, count)
+            categories = catalog[product_indices].tolist()
+            actions = rng.choice(len(self.actions), count, p=self.action_weights).tolist()
+            timestamps = self._timestamps(rng, count, 0, 30)
+            yield [
+                {
+                    "id": behavior_id,
+                    "user_id": user_id,
+                    "product_id": product_id,
+                    "category": self.categories[category],
+                    "action": self.actions[action],
+                    "timestamp": timestamp
+                }
+                for behavior_id, user_id, product_id, category, action, timestamp in zip(
+                    self._ids("user_behaviors", range(start, start + count)),
+                    self._ids("users", user_indices.tolist()),
+                    self._ids("products", product_indices.tolist()),
+                    categories,
+                    actions,
+                    timestamps
+                )
+            ]
+
+    def stream_bulk_data(self, num_users=100, num_products=1000, num_behaviors=5000,
+                         chunk_size: int = 10000) -> Dict[str, Iterator[Dict]]:
+        """Lazily generated rows, keyed like generate_bulk_data, for BulkLoader.load_generated"""
+        return {
+            "users": chain.from_iterable(self.iter_users(num_users, chunk_size)),
+            "products": chain.from_iterable(self.iter_products(num_products, chunk_size)),
+            "user_behaviors": chain.from_iterable(
+                self.iter_behaviors(num_behaviors, num_users, num_products, chunk_size)
             )
-            
-            behavior = {
-                "id": str(uuid.uuid4()),
-                "user_id": user["id"],
-                "product_id": product["id"],
-                "category": product["category"],  # Add the product's category
-                "action": action,
-                "timestamp": behavior_time
-            }
-            user_behaviors.append(behavior)
+        }
 
+    def generate_bulk_data(self, num_users=100, num_products=1000, num_behaviors=5000) -> Dict:
         return {
-            "users": users,
-            "products": products,
-            "user_behaviors": user_behaviors
+            key: list(rows)
+            for key, rows in self.stream_bulk_data(num_users, num_products, num_behaviors).items()
         }
 
     def generate_user_behavior(self, user_id: str, product_id: str) -> Dict:
@@ -326,7 +469,7 @@ class DataGenerator:
             "id": str(uuid.uuid4()),
             "user_id": user_id,
             "product_id": product_id,
-            "category": random.choice(["Electronics", "Books", "Clothing", "Home", "Sports"]),  # Kategori ekledik
-            "action": random.choice(["view", "purchase", "add_to_cart", "wishlist"]),
+            "category": self.random.choice(["Electronics", "Books", "Clothing", "Home", "Sports"]),  # Kategori ekledik
+            "action": self.random.choice(["view", "purchase", "add_to_cart", "wishlist"]),
             "timestamp": datetime.utcnow()
         }
@@ -0,0 +1,165 @@
+"""Query-plan benchmark for the composite feedback/behavior indexes.
+
+Builds a throwaway SQLite database with the hot tables, runs the hot
+queries with only the original single-column indexes, then adds the
+composite indexes declared in app/models.py and runs them again.
+
+Usage:
+    python benchmarks/index_query_plans.py --rows 1000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+CATEGORIES = [
+    "Electronics", "Fashion", "Home & Garden", "Books", "Sports",
+    "Beauty", "Toys", "Automotive", "Health", "Grocery",
+    "Pet Supplies", "Office Products", "Music", "Movies", "Games"
+]
+ACTIONS = ["view", "cart", "purchase", "wishlist", "review"]
+
+# Mirrors the columns and single-column indexes of app/models.py
+SCHEMA = """
+CREATE TABLE recommendation_feedbacks (
+    id VARCHAR NOT NULL PRIMARY KEY,
+    user_id VARCHAR NOT NULL,
+    product_id VARCHAR NOT NULL,
+    rating INTEGER NOT NULL,
+    feedback VARCHAR NOT NULL,
+    created_at DATETIME
+);
+CREATE INDEX ix_recommendation_feedbacks_id ON recommendation_feedbacks (id);
+CREATE INDEX ix_recommendation_feedbacks_user_id ON recommendation_feedbacks (user_id);
+CREATE INDEX ix_recommendation_feedbacks_product_id ON recommendation_feedbacks (product_id);
+
+CREATE TABLE user_behaviors (
+    id VARCHAR NOT NULL PRIMARY KEY,
+    user_id VARCHAR NOT NULL,
+    product_id VARCHAR NOT NULL,
+    category VARCHAR NOT NULL,
+    action VARCHAR NOT NULL,
+    timestamp DATETIME
+);
+CREATE INDEX ix_user_behaviors_id ON user_behaviors (id);
+CREATE INDEX ix_user_behaviors_user_id ON user_behaviors (user_id);
+CREATE INDEX ix_user_behaviors_product_id ON user_behaviors (product_id);
+"""
+
+# The composite indexes from app/models.py
+COMPOSITE_INDEXES = """
+CREATE INDEX ix_recommendation_feedbacks_user_rating_product ON recommendation_feedbacks (user_id, rating, product_id);
+CREATE INDEX ix_recommendation_feedbacks_product_rating ON recommendation_feedbacks (product_id, rating);
+CREATE INDEX ix_user_behaviors_user_category_action_ts ON user_behaviors (user_id, category, action, timestamp);
+"""
+
+QUERIES = {
+    "low_rated_products": (
+        "SELECT product_id FROM recommendation_feedbacks WHERE user_id = ? AND rating <= 3",
+        "user"
+    ),
+    "product_feedback_stats": (
+        "SELECT avg(rating), count(*) FROM recommendation_feedbacks WHERE product_id = ?",
+        "product"
+    ),
+    "user_profile": (
+        "SELECT category, action, count(*) FROM user_behaviors WHERE user_id = ? "
+        "GROUP BY category, action",
+        "user"
+    ),
+    "user_profile_windowed": (
+        "SELECT category, action, count(*) FROM user_behaviors WHERE user_id = ? AND timestamp >= ? "
+        "GROUP BY category, action",
+        "user_window"
+    ),
+}
+
+
+def populate(conn: sqlite3.Connection, rows: int, users: list, products: list, chunk: int = 50000) -> None:
+    now = datetime.utcnow()
+    rng = random.Random(42)
+    for start in range(0, rows, chunk):
+        size = min(chunk, rows - start)
+        conn.executemany(
+            "INSERT INTO recommendation_feedbacks VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (str(uuid.uuid4()), rng.choice(users), rng.choice(products), rng.randint(1, 5),
+                 "Great recommendations!", now)
+                for _ in range(size)
+            ]
+        )
+        conn.executemany(
+            "INSERT INTO user_behaviors VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (str(uuid.uuid4()), rng.choice(users), rng.choice(products), rng.choice(CATEGORIES),
+                 rng.choice(ACTIONS), now - timedelta(days=rng.randint(0, 30)))
+                for _ in range(size)
+            ]
+        )
+        conn.commit()
+
+
+def run_queries(conn: sqlite3.Connection, users: list, products: list, repeats: int) -> dict:
+    rng = random.Random(7)
+    since = datetime.utcnow() - timedelta(days=7)
+    results = {}
+    for name, (sql, kind) in QUERIES.items():
+        params = {
+            "user": lambda: (rng.choice(users),),
+            "product": lambda: (rng.choice(products),),
+            "user_window": lambda: (rng.choice(users), since),
+        }[kind]
+        plan = [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params())]
+        start = time.perf_counter()
+        for _ in range(repeats):
+            conn.execute(sql, params()).fetchall()
+        elapsed = (time.perf_counter() - start) / repeats
+        results[name] = (plan, elapsed)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="rows per table")
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--products", type=int, default=20_000)
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+
+    users = [str(uuid.uuid4()) for _ in range(args.users)]
+    products = [str(uuid.uuid4()) for _ in range(args.products)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, "bench.db"))
+        conn.executescript(SCHEMA)
+
+        start = time.perf_counter()
+        populate(conn, args.rows, users, products)
+        conn.execute("ANALYZE")
+        print(f"Populated {args.rows:,} feedbacks and {args.rows:,} behaviors in {time.perf_counter() - start:.1f}s\n")
+
+        before = run_queries(conn, users, products, args.repeats)
+
+        start = time.perf_counter()
+        conn.executescript(COMPOSITE_INDEXES)
+        conn.execute("ANALYZE")
+        print(f"Created composite indexes in {time.perf_counter() - start:.1f}s\n")
+
+        after = run_queries(conn, users, products, args.repeats)
+        conn.close()
+
+    for name in QUERIES:
+        plan_before, time_before = before[name]
+        plan_after, time_after = after[name]
+        print(f"{name}")
+        print(f"  before: {time_before * 1000:8.3f} ms  {' | '.join(plan_before)}")
+        print(f"  after:  {time_after * 1000:8.3f} ms  {' | '.join(plan_after)}")
+        print(f"  speedup: {time_before / time_after:.1f}x\n")
+
+
+if __name__ == "__main__":
+    main()